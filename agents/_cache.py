@@ -0,0 +1,51 @@
+"""
+Persistent response cache shared by the agents.
+Keeps LLM outputs on disk so unchanged inputs skip the model round-trip across runs.
+"""
+
+import hashlib
+import os
+
+import diskcache
+import orjson
+
+# Bump to invalidate every stored agent output at once
+CACHE_VERSION = 1
+
+CACHE_DIR = os.getenv("AGENT_CACHE_DIR", ".agent_cache")
+
+# LLM_CACHE_OFF=1 forces every model call to run (per-agent outputs and raw prompt completions)
+LLM_CACHE_OFF = os.getenv("LLM_CACHE_OFF") == "1"
+
+
+class _DisabledCache:
+    """Stand-in with the diskcache get/set interface that never stores anything."""
+
+    def get(self, key, default=None):
+        return default
+
+    def set(self, key, value, *args, **kwargs):
+        return False
+
+
+response_cache = _DisabledCache() if LLM_CACHE_OFF else diskcache.Cache(CACHE_DIR)
+
+# sha256(model settings + prompt) -> completion text, shared by every LLM call site
+llm_cache = _DisabledCache() if LLM_CACHE_OFF else diskcache.Cache(os.path.join(CACHE_DIR, "llm"))
+
+# "<digest version>:<path>:<blob sha>" -> condensed file digest, so unchanged files are never re-downloaded
+file_digest_cache = diskcache.Cache(os.path.join(CACHE_DIR, "file_digests"))
+
+
+def content_hash(payload) -> str:
+    """BLAKE2b digest of a JSON-serializable payload, independent of dict key order."""
+    serialized = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str)
+    return hashlib.blake2b(serialized).hexdigest()
+
+
+def cache_version(*parts) -> str:
+    """
+    Short hash of what an agent's cached outputs depend on besides its inputs (prompt text, schema, model).
+    Part of every response_cache key, so editing a prompt or switching models stops serving old outputs.
+    """
+    return content_hash([CACHE_VERSION, *parts])[:16]
@@ -0,0 +1,44 @@
+"""
+System message carrying the inputs shared by the architecture and performance agents.
+Both calls start with byte-identical content, so the provider can reuse the prompt prefix.
+"""
+
+from typing import Any, Dict
+
+import orjson
+from langchain_core.messages import SystemMessage
+
+from state import AnalysisContext
+
+
+_SHARED_CONTEXT_HEAD = """You are one of several specialist reviewers analyzing the same system.
+The inputs below are shared by every reviewer; your role and output schema follow in the next message.
+
+-----------------------------------
+CODE SUMMARIZER OUTPUT (STRUCTURED JSON):
+"""
+
+_SHARED_CONTEXT_METRICS = """
+
+-----------------------------------
+AZURE RUNTIME METRICS (JSON):
+"""
+
+_SHARED_CONTEXT_COST = """
+
+-----------------------------------
+AZURE COST DATA (JSON):
+"""
+
+
+# Static text of the system message, for cache keys of agents that send it (see agents._cache.cache_version)
+SHARED_CONTEXT_SEGMENTS = (_SHARED_CONTEXT_HEAD, _SHARED_CONTEXT_METRICS, _SHARED_CONTEXT_COST)
+
+
+def shared_context_message(code_summarizer_output: Dict[str, Any], analysis_context: AnalysisContext) -> SystemMessage:
+    return SystemMessage(content="".join((
+        _SHARED_CONTEXT_HEAD, orjson.dumps(code_summarizer_output or {}).decode(),
+        _SHARED_CONTEXT_METRICS, analysis_context["azure_metrics_json"],
+        _SHARED_CONTEXT_COST, analysis_context["azure_cost_json"],
+        "\n",
+    )))
@@ -0,0 +1,121 @@
+"""
+Helpers for pulling JSON payloads out of free-form LLM responses.
+"""
+
+import re
+from typing import Optional
+
+# Only quotes, escapes and the bracket pair matter for balancing; everything else is skipped in C
+_ARRAY_TOKENS_RE = re.compile(r'[\[\]"\\]')
+_OBJECT_TOKENS_RE = re.compile(r'[{}"\\]')
+
+
+def _first_balanced(text: str, opener: str, closer: str, tokens_re) -> Optional[str]:
+    start = text.find(opener)
+    if start == -1:
+        return None
+
+    depth = 0
+    in_string = False
+    escaped_pos = -1
+    for match in tokens_re.finditer(text, start):
+        pos = match.start()
+        if pos == escaped_pos:
+            continue
+        char = match.group()
+        if in_string:
+            if char == "\\":
+                escaped_pos = pos + 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == opener:
+            depth += 1
+        elif char == closer:
+            depth -= 1
+            if depth == 0:
+                return text[start:pos + 1]
+    return None
+
+
+def first_json_array(text: str) -> Optional[str]:
+    """
+    Return the first top-level [...] in text, ignoring brackets inside JSON strings.
+    Unlike find('[') / rfind(']'), trailing prose or markdown containing ']' is not swallowed.
+    """
+    return _first_balanced(text, "[", "]", _ARRAY_TOKENS_RE)
+
+
+def first_json_object(text: str) -> Optional[str]:
+    """
+    Return the first top-level {...} in text, ignoring braces inside JSON strings.
+    """
+    return _first_balanced(text, "{", "}", _OBJECT_TOKENS_RE)
+
+
+def outermost_json_object(text: str) -> bytes:
+    """
+    UTF-8 bytes from the first '{' to the last '}' in text (or all of text), ready for orjson.loads.
+    Encodes once so both scans run as bytes.find / bytes.rfind (memchr) and the slice needs no re-encoding.
+    """
+    buffer = text.encode("utf-8")
+    start = buffer.find(b"{")
+    end = buffer.rfind(b"}") + 1
+    return buffer[start:end] if start != -1 and end > start else buffer
+
+
+class JsonStreamScanner:
+    """
+    Incremental first_json_array / first_json_object for streamed LLM output.
+    Each feed() scans only the new chunk and returns the value once its closing bracket arrives,
+    so the caller can stop reading the stream without waiting for trailing prose.
+    """
+
+    def __init__(self, opener: str = "[", closer: str = "]"):
+        self._opener = opener
+        self._closer = closer
+        self._tokens_re = _ARRAY_TOKENS_RE if opener == "[" else _OBJECT_TOKENS_RE
+        self._chunks = []
+        self._length = 0
+        self._start = -1
+        self._depth = 0
+        self._in_string = False
+        self._escaped_pos = -1
+        self.value: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        return "".join(self._chunks)
+
+    def feed(self, chunk: str) -> Optional[str]:
+        if self.value is not None or not chunk:
+            return self.value
+
+        offset = self._length
+        self._chunks.append(chunk)
+        self._length += len(chunk)
+        for match in self._tokens_re.finditer(chunk):
+            pos = offset + match.start()
+            char = match.group()
+            if self._start == -1:
+                if char != self._opener:
+                    continue
+                self._start = pos
+            if pos == self._escaped_pos:
+                continue
+            if self._in_string:
+                if char == "\\":
+                    self._escaped_pos = pos + 1
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == self._opener:
+                self._depth += 1
+            elif char == self._closer:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.value = self.text[self._start:pos + 1]
+                    return self.value
+        return None
@@ -0,0 +1,116 @@
+"""
+Shared Groq chat model construction for the agents.
+The .env file is read once at import; client setup happens once per (model, temperature) pair.
+Completions are cached on disk by prompt hash (see agents._cache.llm_cache; LLM_CACHE_OFF=1 disables).
+"""
+
+import hashlib
+import os
+from functools import lru_cache
+from typing import Optional, Sequence, Tuple, Union
+
+import orjson
+from dotenv import load_dotenv
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_groq import ChatGroq
+
+from agents._cache import llm_cache
+from agents._json import JsonStreamScanner
+
+load_dotenv()
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+
+Prompt = Union[str, Sequence[BaseMessage]]
+
+DEFAULT_MODEL = "llama-3.1-8b-instant"
+
+
+@lru_cache(maxsize=4)
+def get_llm(model_name: str = DEFAULT_MODEL, temperature: float = 0.5) -> ChatGroq:
+    """Return a cached ChatGroq client for the given model settings."""
+    if not GROQ_API_KEY:
+        raise RuntimeError("GROQ_API_KEY missing")
+    return ChatGroq(model_name=model_name, temperature=temperature, api_key=GROQ_API_KEY)
+
+
+def _prompt_key(prompt: Prompt, model_name: str, temperature: float) -> str:
+    messages = prompt if isinstance(prompt, str) else [(message.type, message.content) for message in prompt]
+    serialized = orjson.dumps([model_name, temperature, messages])
+    return "llm:" + hashlib.sha256(serialized).hexdigest()
+
+
+def _lookup(prompt: Prompt, model_name: str, temperature: float) -> Tuple[Optional[AIMessage], str]:
+    key = _prompt_key(prompt, model_name, temperature)
+    content = llm_cache.get(key)
+    return (AIMessage(content=content) if content is not None else None), key
+
+
+def _live(content: str, key: str) -> AIMessage:
+    # The key rides along so the agent can store the reply once it has parsed (remember_completion)
+    return AIMessage(content=content, response_metadata={"llm_cache_key": key})
+
+
+def remember_completion(response: AIMessage) -> None:
+    """
+    Store a live completion in the prompt cache. Agents call this only after the reply has parsed
+    and validated, so a malformed reply is retried on the next run instead of replayed.
+    Replies that came from the cache carry no key and are left alone.
+    """
+    key = response.response_metadata.get("llm_cache_key")
+    if key is not None and response.content:
+        llm_cache.set(key, response.content)
+
+
+def invoke_llm(prompt: Prompt, model_name: str = DEFAULT_MODEL, temperature: float = 0.5) -> AIMessage:
+    """get_llm().invoke behind the prompt-hash cache."""
+    cached, key = _lookup(prompt, model_name, temperature)
+    if cached is not None:
+        return cached
+    return _live(get_llm(model_name, temperature).invoke(prompt).content, key)
+
+
+async def ainvoke_llm(prompt: Prompt, model_name: str = DEFAULT_MODEL, temperature: float = 0.5) -> AIMessage:
+    """get_llm().ainvoke behind the prompt-hash cache."""
+    cached, key = _lookup(prompt, model_name, temperature)
+    if cached is not None:
+        return cached
+    return _live((await get_llm(model_name, temperature).ainvoke(prompt)).content, key)
+
+
+def stream_llm_json(prompt: Prompt, opener: str = "[", closer: str = "]",
+                    model_name: str = DEFAULT_MODEL, temperature: float = 0.5) -> AIMessage:
+    """
+    get_llm().stream behind the prompt-hash cache, stopping as soon as the first top-level
+    JSON value closes instead of waiting for trailing tokens.
+    """
+    cached, key = _lookup(prompt, model_name, temperature)
+    if cached is not None:
+        return cached
+
+    scanner = JsonStreamScanner(opener, closer)
+    stream = get_llm(model_name, temperature).stream(prompt)
+    try:
+        for chunk in stream:
+            if scanner.feed(chunk.content) is not None:
+                break
+    finally:
+        stream.close()
+    return _live(scanner.value if scanner.value is not None else scanner.text, key)
+
+
+async def astream_llm_json(prompt: Prompt, opener: str = "[", closer: str = "]",
+                           model_name: str = DEFAULT_MODEL, temperature: float = 0.5) -> AIMessage:
+    """Async variant of stream_llm_json."""
+    cached, key = _lookup(prompt, model_name, temperature)
+    if cached is not None:
+        return cached
+
+    scanner = JsonStreamScanner(opener, closer)
+    stream = get_llm(model_name, temperature).astream(prompt)
+    try:
+        async for chunk in stream:
+            if scanner.feed(chunk.content) is not None:
+                break
+    finally:
+        await stream.aclose()
+    return _live(scanner.value if scanner.value is not None else scanner.text, key)
@@ -0,0 +1,37 @@
+"""
+Validators for the JSON shapes the agents ask the LLM to return.
+Each TypeAdapter is built once at import, so pydantic compiles the schema a single time and
+validate_python runs in pydantic-core. Only the fields downstream code relies on are required.
+"""
+
+from typing import Any, List
+
+from pydantic import TypeAdapter
+from typing_extensions import NotRequired, TypedDict
+
+
+class CostProposal(TypedDict):
+    issue_detected: str
+    recommendation: str
+    affected_services: NotRequired[List[str]]
+
+
+class RankedRecommendation(TypedDict):
+    recommendation: str
+    rank: NotRequired[int]
+
+
+class ImplementationPlan(TypedDict, total=False):
+    immediate_actions: List[str]
+    short_term: List[str]
+    long_term: List[str]
+
+
+class ModeratorEvaluation(TypedDict):
+    conflicts_detected: NotRequired[List[Any]]
+    ranked_recommendations: List[RankedRecommendation]
+    implementation_plan: ImplementationPlan
+
+
+finops_proposals_validator = TypeAdapter(List[CostProposal])
+moderator_evaluation_validator = TypeAdapter(ModeratorEvaluation)
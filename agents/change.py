@@ -1,55 +1,26 @@
-import os
-import json
+import orjson
+from itertools import islice
 from typing import Dict, List, Any, Optional
-from langchain_groq import ChatGroq
+from agents._llm import invoke_llm, remember_completion
+from agents._json import outermost_json_object
 from langchain_core.messages import HumanMessage
-from dotenv import load_dotenv
 
-load_dotenv()
 
-os.environ["GROQ_API_KEY"] = os.getenv("GROQ_API_KEY")
-llm = ChatGroq(model_name="llama-3.1-8b-instant", temperature=0.5)
-
-
-def change_agent(state: "AgentState") -> Dict[str, Any]:
-    """Analyze code changes and their potential impact on infrastructure.
-    
-    Evaluates:
-    - Code change scope and complexity
-    - Infrastructure impact of code changes
-    - Risk assessment for deploying changes
-    - Testing and validation requirements
-    - Infrastructure capacity for new code patterns
-    
-    Args:
-        state: Global agent state containing git_diff and code_analysis
-        
-    Returns:
-        Dictionary with change_analysis and negotiation_history updates
-    """
-    git_diff = state.get('git_diff', '')
-    code_analysis = state.get('code_analysis', {})
-    cloud_stats = state.get('cloud_stats', {})
-    performance_feedback = state.get('performance_feedback', [])
-    history_context = "\n".join(state.get('negotiation_history', [])[-2:]) if state.get('negotiation_history') else ""
-    
-    # Format change context
-    change_context = format_change_context(git_diff, code_analysis, cloud_stats)
-    perf_text = json.dumps(performance_feedback, indent=2) if performance_feedback else "No performance feedback yet"
-    
-    prompt = f"""You are a DevOps/Infrastructure impact analysis specialist reviewing code changes.
+# Static prompt segments around the per-call inputs, joined without format parsing
+_CHANGE_PROMPT_HEAD = """You are a DevOps/Infrastructure impact analysis specialist reviewing code changes.
 
 Your role is to assess how code changes impact infrastructure requirements and stability.
 
 You are NOT a code reviewer - focus on INFRASTRUCTURE IMPACT, not code quality.
 You are NOT a performance engineer - rely on provided performance feedback.
 
-{change_context}
+"""
+
+_CHANGE_PROMPT_FEEDBACK = "\n\nCurrent Performance Feedback:\n"
 
-Current Performance Feedback:
-{perf_text}
+_CHANGE_PROMPT_HISTORY = "\n\n"
 
-{f'Previous context: {history_context}' if history_context else 'Perform initial change impact assessment.'}
+_CHANGE_PROMPT_TAIL = """
 
 Analyze the code changes and evaluate impact on:
 
@@ -80,7 +51,7 @@ Analyze the code changes and evaluate impact on:
 IMPORTANT: Return ONLY a valid JSON object. Must have keys: impact_assessment, infrastructure_changes, risk_level, deployment_requirements, monitoring_needs, estimated_effort.
 
 Example format:
-{{
+{
 "impact_assessment": "Changes introduce async processing requiring queue infrastructure and worker scaling",
 "infrastructure_changes": [
   "Add message queue service (SQS/RabbitMQ)",
@@ -99,20 +70,49 @@ Example format:
   "Dead letter queue metrics"
 ],
 "estimated_effort": "High - requires coordinated infrastructure and code deployment"
-}}"""
+}"""
+
+
+def change_agent(state: "AgentState") -> Dict[str, Any]:
+    """Analyze code changes and their potential impact on infrastructure.
+    
+    Evaluates:
+    - Code change scope and complexity
+    - Infrastructure impact of code changes
+    - Risk assessment for deploying changes
+    - Testing and validation requirements
+    - Infrastructure capacity for new code patterns
+    
+    Args:
+        state: Global agent state containing git_diff and code_analysis
+        
+    Returns:
+        Dictionary with change_analysis and negotiation_history updates
+    """
+    git_diff = state.get('git_diff', '')
+    code_analysis = state.get('code_analysis', {})
+    cloud_stats = state.get('cloud_stats', {})
+    performance_feedback = state.get('performance_feedback', [])
+    history_context = "\n".join(state.get('negotiation_history', [])[-2:]) if state.get('negotiation_history') else ""
+    
+    # Format change context
+    change_context = format_change_context(git_diff, code_analysis, cloud_stats)
+    perf_text = orjson.dumps(performance_feedback, option=orjson.OPT_INDENT_2).decode() if performance_feedback else "No performance feedback yet"
     
-    response = llm.invoke([HumanMessage(content=prompt)])
+    history_text = f'Previous context: {history_context}' if history_context else 'Perform initial change impact assessment.'
+    prompt = "".join((
+        _CHANGE_PROMPT_HEAD, change_context,
+        _CHANGE_PROMPT_FEEDBACK, perf_text,
+        _CHANGE_PROMPT_HISTORY, history_text,
+        _CHANGE_PROMPT_TAIL,
+    ))
+    
+    response = invoke_llm([HumanMessage(content=prompt)])
     response_text = response.content.strip()
     
     analysis = {}
     try:
-        start_idx = response_text.find('{')
-        end_idx = response_text.rfind('}') + 1
-        if start_idx != -1 and end_idx > start_idx:
-            json_str = response_text[start_idx:end_idx]
-            analysis = json.loads(json_str)
-        else:
-            analysis = json.loads(response_text)
+        analysis = orjson.loads(outermost_json_object(response_text))
         
         if not isinstance(analysis, dict):
             analysis = {
@@ -123,7 +123,9 @@ Example format:
                 "monitoring_needs": [],
                 "estimated_effort": "Unknown"
             }
-    except json.JSONDecodeError:
+        else:
+            remember_completion(response)
+    except orjson.JSONDecodeError:
         analysis = {
             "impact_assessment": response_text,
             "infrastructure_changes": [],
@@ -133,11 +135,12 @@ Example format:
             "estimated_effort": "Unknown"
         }
     
-    change_msg = f"CODE CHANGE ANALYSIS (Turn {state.get('turn_count', 0)}):\n" + json.dumps(analysis, indent=2)
+    change_msg = f"CODE CHANGE ANALYSIS (Turn {state.get('turn_count', 0)}):\n" + orjson.dumps(analysis, option=orjson.OPT_INDENT_2).decode()
     
     return {
         "change_analysis": analysis,
-        "negotiation_history": state.get('negotiation_history', []) + [change_msg]
+        # Only the new message; the negotiation_history reducer appends it to the channel
+        "negotiation_history": [change_msg]
     }
 
 
@@ -152,48 +155,45 @@ def format_change_context(git_diff: str, code_analysis: Dict[str, Any], cloud_st
     Returns:
         Formatted string with change analysis context
     """
-    context = "Code Change Impact Context:\n"
-    context += "=" * 70 + "\n"
+    parts = ["Code Change Impact Context:\n", "=" * 70 + "\n"]
     
     # Git diff summary
     if git_diff:
-        context += "\nGit Diff Summary:\n"
+        parts.append("\nGit Diff Summary:\n")
         lines = git_diff.split('\n')
         additions = sum(1 for line in lines if line.startswith('+'))
         deletions = sum(1 for line in lines if line.startswith('-'))
-        context += f"  - Lines added: {additions}\n"
-        context += f"  - Lines deleted: {deletions}\n"
-        context += f"  - Files changed: {len(set(line.split(':')[0] for line in lines if '/' in line))}\n"
+        parts.append(f"  - Lines added: {additions}\n")
+        parts.append(f"  - Lines deleted: {deletions}\n")
+        parts.append(f"  - Files changed: {len(set(line.split(':')[0] for line in lines if '/' in line))}\n")
         
         # Show excerpt
-        context += "\nChange Excerpt:\n"
+        parts.append("\nChange Excerpt:\n")
         excerpt_lines = [l for l in lines if l.startswith(('+', '-'))][:20]
-        for line in excerpt_lines:
-            context += f"  {line[:80]}\n"
+        parts.extend(f"  {line[:80]}\n" for line in excerpt_lines)
         if len(excerpt_lines) >= 20:
-            context += "  ...\n"
+            parts.append("  ...\n")
     
     # Code analysis context
     if code_analysis:
-        context += "\nExisting Code Architecture:\n"
+        parts.append("\nExisting Code Architecture:\n")
         if 'application' in code_analysis:
             app = code_analysis['application']
             if 'framework' in app:
-                context += f"  - Framework: {app['framework']}\n"
+                parts.append(f"  - Framework: {app['framework']}\n")
             if 'language' in app:
-                context += f"  - Language: {app['language']}\n"
+                parts.append(f"  - Language: {app['language']}\n")
             if 'project_structure' in app:
-                context += "  - Project Structure:\n"
-                for key, val in app['project_structure'].items():
-                    context += f"      - {key}: {val}\n"
+                parts.append("  - Project Structure:\n")
+                parts.extend(f"      - {key}: {val}\n" for key, val in app['project_structure'].items())
     
     # Current infrastructure
     if cloud_stats:
-        context += "\nCurrent Infrastructure Capacity:\n"
+        parts.append("\nCurrent Infrastructure Capacity:\n")
         for service, stats in cloud_stats.items():
             if isinstance(stats, dict):
-                context += f"  - {service}:\n"
-                for key, val in list(stats.items())[:3]:  # Limit to 3 key metrics
-                    context += f"      - {key}: {val}\n"
+                parts.append(f"  - {service}:\n")
+                # Limit to 3 key metrics
+                parts.extend(f"      - {key}: {val}\n" for key, val in islice(stats.items(), 3))
     
-    return context
+    return "".join(parts)
@@ -1,18 +1,16 @@
-from data.github_extractor import extract_repo_code
-import os
-import json
-from dotenv import load_dotenv
-from langchain_groq import ChatGroq
+import asyncio
+import logging
+from typing import Optional
+from data.github_extractor import list_repo_files, download_repo_files, adownload_repo_files
+from data.code_digest import DIGEST_VERSION, digest_file
+from agents._cache import response_cache, file_digest_cache, content_hash, cache_version
+import orjson
+from agents._llm import DEFAULT_MODEL, invoke_llm, ainvoke_llm, remember_completion
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-os.environ["GROQ_API_KEY"] = os.getenv("GROQ_API_KEY")
-llm = ChatGroq(model_name="llama-3.1-8b-instant", temperature=0.5)
-
-def code_summarizer_agent(state, repo_url: str):
-    code_files = extract_repo_code(repo_url)
-
-    prompt = f"""
+# Static halves of the prompt around the digest, joined once per call (no format parsing)
+_SUMMARIZER_PROMPT_HEAD = """
     You are a senior software architecture and infrastructure analyzer.
 
 Your task is to analyze a backend codebase that may include both application source code and Terraform infrastructure files.
@@ -25,39 +23,41 @@ Do not include analysis text.
 Return a single JSON object.
 
 The input will contain multiple source code files and optionally Terraform (.tf) files from a project.
+Each file is condensed to its signal-carrying lines: imports, decorators/routes, function and class signatures,
+inline SQL, environment variable access, Terraform block headers and attributes, and config/CI files verbatim.
 
 You must extract structured architectural and infrastructure parameters.
 
 Return the following JSON schema:
 
-{{
-"application": {{
+{
+"application": {
 "framework": string | null,
 "language": string | null,
-"project_structure": {{
+"project_structure": {
 "layered_architecture": boolean,
 "separate_service_layer": boolean,
 "repository_pattern": boolean,
 "monolithic": boolean,
 "microservice_ready": boolean,
 "circular_imports_detected": boolean
-}},
-"api_design": {{
+},
+"api_design": {
 "route_count": integer,
 "uses_dependency_injection": boolean,
 "uses_pydantic_models": boolean,
 "validation_present": boolean,
 "pagination_supported": boolean,
 "rate_limiting_present": boolean
-}},
-"concurrency": {{
+},
+"concurrency": {
 "async_routes_count": integer,
 "blocking_db_calls": boolean,
 "background_tasks_used": boolean,
 "threadpool_usage": boolean,
 "global_state_used": boolean
-}},
-"database_architecture": {{
+},
+"database_architecture": {
 "database_used": boolean,
 "orm_used": string | null,
 "raw_sql_queries": integer,
@@ -66,94 +66,94 @@ Return the following JSON schema:
 "n_plus_one_risk": boolean,
 "long_running_queries_detected": boolean,
 "index_usage_detected": boolean
-}},
-"caching": {{
+},
+"caching": {
 "cache_layer_present": boolean,
 "redis_used": boolean,
 "in_memory_cache": boolean,
 "cache_invalidation_strategy": string | null
-}},
-"security": {{
+},
+"security": {
 "auth_present": boolean,
 "jwt_used": boolean,
 "cors_configured": boolean,
 "secrets_hardcoded": boolean,
 "input_sanitization": boolean
-}},
-"devops": {{
+},
+"devops": {
 "dockerized": boolean,
 "ci_cd_pipeline": boolean,
 "environment_variables_used": boolean,
 "health_check_endpoint": boolean,
 "logging_configured": boolean,
 "structured_logging": boolean
-}},
-"observability": {{
+},
+"observability": {
 "metrics_exposed": boolean,
 "application_insights_integrated": boolean,
 "logging_level_configurable": boolean,
 "distributed_tracing": boolean
-}},
-"scalability": {{
+},
+"scalability": {
 "stateless_design": boolean,
 "shared_session_state": boolean,
 "file_storage_local": boolean,
 "horizontal_scaling_safe": boolean,
 "auto_scaling_ready": boolean
-}},
-"risk_indicators": {{
+},
+"risk_indicators": {
 "heavy_select_queries": integer,
 "large_payload_endpoints": integer,
 "synchronous_external_calls": integer,
 "cpu_intensive_loops": integer
-}},
+},
 "architectural_concerns": [string]
-}},
-"infrastructure": {{
+},
+"infrastructure": {
 "cloud_provider": string | null,
-"compute": {{
+"compute": {
 "app_service_present": boolean,
 "container_based": boolean,
 "serverless_used": boolean,
 "vm_used": boolean,
 "autoscaling_configured": boolean,
 "instance_sku": string | null
-}},
-"database": {{
+},
+"database": {
 "managed_database": boolean,
 "database_type": string | null,
 "database_tier": string | null,
 "private_networking_enabled": boolean,
 "backup_configured": boolean
-}},
-"caching": {{
+},
+"caching": {
 "redis_present": boolean,
 "cache_sku": string | null
-}},
-"networking": {{
+},
+"networking": {
 "vnet_configured": boolean,
 "private_endpoints": boolean,
 "public_access_enabled": boolean,
 "load_balancer_present": boolean
-}},
-"security": {{
+},
+"security": {
 "managed_identity_used": boolean,
 "key_vault_used": boolean,
 "https_enforced": boolean,
 "firewall_rules_defined": boolean
-}},
-"storage": {{
+},
+"storage": {
 "storage_account_present": boolean,
 "cdn_used": boolean
-}},
-"cost_risk_indicators": {{
+},
+"cost_risk_indicators": {
 "overprovisioned_compute": boolean,
 "single_point_of_failure": boolean,
 "no_autoscaling": boolean,
 "public_database_exposed": boolean
-}}
-}}
-}}
+}
+}
+}
 
 Extraction Rules:
 
@@ -187,15 +187,96 @@ Return only JSON.
 No extra text.
 
 CODE FILES:
-{code_files}
-    """
+"""
+
+_SUMMARIZER_PROMPT_TAIL = "\n    "
+
+
+# The prompt embeds file digests, so a digest change also invalidates stored summaries
+_CACHE_VERSION = cache_version(_SUMMARIZER_PROMPT_HEAD, _SUMMARIZER_PROMPT_TAIL, DIGEST_VERSION, DEFAULT_MODEL)
+
+
+def _cache_key(file_shas) -> str:
+    # Blob SHAs change with content, so (path, sha) pairs pin the exact repo state
+    return f"code_summarizer:{_CACHE_VERSION}:{content_hash(sorted(file_shas.items()))}"
+
+
+def _digest_key(path: str, sha: str) -> str:
+    return f"{DIGEST_VERSION}:{path}:{sha}"
+
+
+def _cached_digests(file_shas):
+    """Split files into those with a cached digest for their current SHA and those to download."""
+    digests = {}
+    missing = []
+    for path, sha in file_shas.items():
+        digest = file_digest_cache.get(_digest_key(path, sha))
+        if digest is None:
+            missing.append(path)
+        else:
+            digests[path] = digest
+    return digests, missing
+
+
+def _merge_digests(file_shas, digests, downloaded) -> str:
+    """Digest freshly downloaded files, cache them by SHA and join everything in path order."""
+    for path, content in downloaded.items():
+        digest = digest_file(path, content)
+        file_digest_cache.set(_digest_key(path, file_shas[path]), digest)
+        digests[path] = digest
+    return "\n\n".join(digests[path] for path in sorted(digests))
 
-    response = llm.invoke(prompt)
+
+def _build_prompt(code_digest: str) -> str:
+    return "".join((_SUMMARIZER_PROMPT_HEAD, code_digest, _SUMMARIZER_PROMPT_TAIL))
+
+
+def _parse_response(response, cache_key: Optional[str]):
     response_text = response.content.strip()
-    print(response_text)
+    logger.debug("code_summarizer LLM response: %s", response_text)
     try:
-        architectural_analysis = json.loads(response_text)
-    except json.JSONDecodeError:
+        architectural_analysis = orjson.loads(response_text)
+        if cache_key is not None:
+            response_cache.set(cache_key, architectural_analysis)
+        remember_completion(response)
+    except orjson.JSONDecodeError:
         architectural_analysis = {"error": "Failed to parse JSON response", "raw_response": response_text}
     return architectural_analysis
 
+
+def code_summarizer_agent(state, repo_url: str):
+    commit_sha, file_shas = list_repo_files(repo_url)
+
+    cache_key = _cache_key(file_shas)
+    cached_analysis = response_cache.get(cache_key)
+    if cached_analysis is not None:
+        return cached_analysis
+
+    digests, missing = _cached_digests(file_shas)
+    downloaded = download_repo_files(repo_url, missing, commit_sha)
+    if len(downloaded) < len(missing):
+        # Some files were skipped; don't cache a summary of a partial repo under the full tree's key
+        cache_key = None
+
+    response = invoke_llm(_build_prompt(_merge_digests(file_shas, digests, downloaded)))
+    return _parse_response(response, cache_key)
+
+
+async def acode_summarizer_agent(state, repo_url: str):
+    commit_sha, file_shas = await asyncio.to_thread(list_repo_files, repo_url)
+
+    cache_key = _cache_key(file_shas)
+    cached_analysis = response_cache.get(cache_key)
+    if cached_analysis is not None:
+        return cached_analysis
+
+    digests, missing = _cached_digests(file_shas)
+    downloaded = await adownload_repo_files(repo_url, missing, commit_sha)
+    if len(downloaded) < len(missing):
+        # Some files were skipped; don't cache a summary of a partial repo under the full tree's key
+        cache_key = None
+    # Digesting and SHA-cache writes are CPU/disk work; keep them off the event loop
+    code_digest = await asyncio.to_thread(_merge_digests, file_shas, digests, downloaded)
+
+    response = await ainvoke_llm(_build_prompt(code_digest))
+    return _parse_response(response, cache_key)
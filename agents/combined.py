@@ -0,0 +1,233 @@
+import orjson
+from typing import Dict, Any, List
+from pydantic import ValidationError
+from langchain_core.messages import BaseMessage, HumanMessage
+from agents._llm import DEFAULT_MODEL, invoke_llm, ainvoke_llm, remember_completion
+from agents._cache import response_cache, content_hash, cache_version
+from agents._context import SHARED_CONTEXT_SEGMENTS, shared_context_message
+from agents._json import first_json_object
+from agents._schemas import finops_proposals_validator, moderator_evaluation_validator
+from state import AnalysisContext
+
+
+# Architecture, performance, FinOps and moderator roles in one call; same shared system message as the specialists
+_COMBINED_PROMPT = """You will act as four reviewers in sequence and return all of their outputs at once.
+Base every section ONLY on the inputs in the system message.
+Do NOT invent services, metrics, costs, latencies, resource names, or infrastructure components.
+If something is unknown, use null/[] and say so in the relevant issues list.
+
+-----------------------------------
+SECTION "architecture" - Senior Cloud Architecture Reviewer
+STRICTLY architecture and reliability/scalability risk review (not cost, not performance tuning).
+Return 3-5 distinct architecture issues and 3-5 concrete recommendations.
+
+SECTION "performance" - Performance SRE
+STRICTLY performance risk identification and safe mitigations (not cost, not architecture).
+Return 3-5 distinct performance issues and 3-5 concrete recommendations.
+If metrics do not contain latency/throughput, leave those fields null.
+
+SECTION "finops" - Senior Azure FinOps Architect
+STRICTLY cost optimization. Identify the TOP 3 cost optimization opportunities that reduce
+unnecessary spending, avoid degrading performance, avoid increasing operational risk and do NOT
+contradict obvious utilization signals.
+Mandatory Evaluation Rules:
+1. If CPU or utilization < 30% consistently → Likely overprovisioned.
+2. If utilization > 80% sustained → Scaling down is NOT allowed.
+3. If no autoscaling → Consider cost inefficiency during low traffic.
+4. If high database cost but moderate compute → Investigate DB tier mismatch.
+5. If storage is mostly inactive → Consider Cool/Archive tier.
+6. If long backup retention → Flag potential waste.
+7. If single-instance compute without scaling → Avoid aggressive downsizing.
+8. Never recommend changes that would likely increase performance bottlenecks.
+Constraints: do NOT hallucinate Azure pricing; give a percentage estimate and a dollar estimate ONLY
+if the cost data explicitly includes pricing; state conservative estimates when data is insufficient;
+avoid generic advice like "optimize costs"; no more than 3 recommendations.
+risk_level: Low (simple configuration change) | Medium (requires validation/testing) | High (architecture-level shift).
+confidence_level: High (clear underutilization or waste) | Medium (moderate signal) | Low (limited cost clarity).
+
+SECTION "moderator" - Autonomous SRE Decision Engine
+Reason ONLY over the three sections above. Detect conflicts between them, score and rank their
+recommendations (production safety first, performance stability second, cost third), and never
+prioritize cost reduction over stability. If agents conflict, explain why one recommendation is suppressed.
+
+-----------------------------------
+Return ONLY a valid JSON object (no markdown, no commentary) with exactly these keys:
+
+{
+  "architecture": {
+    "issues_detected": [string],
+    "recommendations": [string],
+    "architecture_style": string | null,
+    "cloud_topology": {
+      "compute": string | null,
+      "database": string | null,
+      "storage": string | null,
+      "networking": string | null,
+      "caching_layer_present": boolean | null,
+      "autoscaling_enabled": boolean | null
+    },
+    "scalability_assessment": {
+      "horizontal_scaling_safe": boolean | null,
+      "bottleneck_component": string | null,
+      "scalability_risk_level": "Low" | "Medium" | "High" | "Unknown"
+    },
+    "reliability_assessment": {
+      "single_point_of_failure_detected": boolean | null,
+      "failover_strategy_detected": boolean | null,
+      "resilience_score": number | null
+    }
+  },
+  "performance": {
+    "issues_detected": [string],
+    "recommendations": [string],
+    "utilization_summary": {
+      "compute_cpu": string | null,
+      "compute_memory": string | null,
+      "compute_instances": number | null,
+      "autoscaling_enabled": boolean | null,
+      "database_utilization": string | null
+    },
+    "bottlenecks": [string],
+    "sla_risks": [string],
+    "response_time_analysis": {
+      "average_response_time_ms": number | null,
+      "p95_response_time_ms": number | null,
+      "p99_response_time_ms": number | null
+    },
+    "throughput": {
+      "requests_per_second": number | null,
+      "current_load_percentage": number | null
+    }
+  },
+  "finops": [
+    {
+      "issue_detected": string,
+      "recommendation": string,
+      "estimated_savings": string,
+      "risk_level": string,
+      "affected_services": [string],
+      "confidence_level": string
+    }
+  ],
+  "moderator": {
+    "conflicts_detected": [
+      {"description": string, "agents_involved": [string], "resolution_decision": string}
+    ],
+    "ranked_recommendations": [
+      {
+        "rank": integer,
+        "recommendation": string,
+        "impact": string,
+        "risk": string,
+        "cost_benefit": string,
+        "implementation_effort": string,
+        "rationale": string
+      }
+    ],
+    "implementation_plan": {
+      "immediate_actions": [string],
+      "short_term": [string],
+      "long_term": [string]
+    }
+  }
+}
+"""
+
+
+_CACHE_VERSION = cache_version(
+    *SHARED_CONTEXT_SEGMENTS, _COMBINED_PROMPT,
+    finops_proposals_validator.json_schema(), moderator_evaluation_validator.json_schema(), DEFAULT_MODEL,
+)
+
+
+def _cache_key(code_summarizer_output: Dict[str, Any], analysis_context: AnalysisContext) -> str:
+    return f"combined:{_CACHE_VERSION}:" + content_hash({
+        "code_summarizer_output": code_summarizer_output,
+        "azure_metrics": analysis_context["azure_metrics"],
+        "azure_cost": analysis_context["azure_cost"],
+    })
+
+
+def _build_messages(code_summarizer_output: Dict[str, Any], analysis_context: AnalysisContext) -> List[BaseMessage]:
+    return [shared_context_message(code_summarizer_output, analysis_context), HumanMessage(content=_COMBINED_PROMPT)]
+
+
+def _review_section(section: Any, name: str) -> Dict[str, Any]:
+    if not isinstance(section, dict):
+        return {"analysis_status": "failed", "error": f"Combined analysis returned no {name} object"}
+    # Same limits as the standalone architecture/performance agents
+    for key in ("issues_detected", "recommendations"):
+        if isinstance(section.get(key), list):
+            section[key] = section[key][:5]
+    section.setdefault("analysis_status", "completed")
+    return section
+
+
+def _parse_response(response, cache_key: str) -> Dict[str, Any]:
+    response_text = (response.content or "").strip() if response else ""
+    json_str = first_json_object(response_text)
+    combined = orjson.loads(json_str if json_str is not None else response_text)
+    if not isinstance(combined, dict):
+        raise ValueError("Combined analysis returned non-object JSON")
+
+    proposals = combined.get("finops")
+    try:
+        finops_proposals_validator.validate_python(proposals)
+        finops_output = {"cost_inefficiencies": proposals, "analysis_status": "completed"}
+    except ValidationError as e:
+        finops_output = {
+            "analysis_status": "failed",
+            "error": f"Combined analysis returned FinOps JSON not matching the proposal schema: {str(e)[:200]}",
+            "cost_inefficiencies": [],
+        }
+
+    moderator_output = combined.get("moderator")
+    try:
+        moderator_evaluation_validator.validate_python(moderator_output)
+    except ValidationError as e:
+        moderator_output = {
+            "error": f"Combined analysis returned moderator JSON not matching the evaluation schema: {str(e)[:200]}",
+        }
+
+    outputs = {
+        "architecture_output": _review_section(combined.get("architecture"), "architecture"),
+        "performance_output": _review_section(combined.get("performance"), "performance"),
+        "finops_output": finops_output,
+        "moderator_output": moderator_output,
+    }
+    # Only a fully valid reply is cached; a degraded one is retried on the next run
+    if "error" not in moderator_output and all(
+        outputs[name].get("analysis_status") == "completed"
+        for name in ("architecture_output", "performance_output", "finops_output")
+    ):
+        response_cache.set(cache_key, outputs)
+        remember_completion(response)
+    return outputs
+
+
+def combined_agent(code_summarizer_output: Dict[str, Any], analysis_context: AnalysisContext) -> Dict[str, Any]:
+    """
+    Produce architecture, performance, FinOps and moderator outputs from a single LLM call.
+
+    Returns a dict keyed by the State fields it fills (architecture_output, performance_output,
+    finops_output, moderator_output). A section that fails validation is returned as an
+    error for that section only; raises if the response cannot be parsed at all.
+    """
+    cache_key = _cache_key(code_summarizer_output, analysis_context)
+    cached_outputs = response_cache.get(cache_key)
+    if cached_outputs is not None:
+        return cached_outputs
+
+    response = invoke_llm(_build_messages(code_summarizer_output, analysis_context))
+    return _parse_response(response, cache_key)
+
+
+async def acombined_agent(code_summarizer_output: Dict[str, Any], analysis_context: AnalysisContext) -> Dict[str, Any]:
+    """Async variant of combined_agent; awaits the LLM without blocking the event loop."""
+    cache_key = _cache_key(code_summarizer_output, analysis_context)
+    cached_outputs = response_cache.get(cache_key)
+    if cached_outputs is not None:
+        return cached_outputs
+
+    response = await ainvoke_llm(_build_messages(code_summarizer_output, analysis_context))
+    return _parse_response(response, cache_key)
@@ -1,15 +1,14 @@
-import os
-import json
-from dotenv import load_dotenv
-from langchain_groq import ChatGroq
-
-load_dotenv()
-
-os.environ["GROQ_API_KEY"] = os.getenv("GROQ_API_KEY")
-llm = ChatGroq(model_name="llama-3.1-8b-instant", temperature=0.5)
-
-def finops_agent(azure_metrics: dict, azure_cost: dict):
-  prompt = f"""You are a Senior Azure FinOps Architect.
+import string
+import orjson
+from pydantic import ValidationError
+from agents._llm import DEFAULT_MODEL, stream_llm_json, astream_llm_json, remember_completion
+from agents._cache import response_cache, content_hash, cache_version
+from agents._json import first_json_array
+from agents._schemas import finops_proposals_validator
+from state import AnalysisContext
+
+# Filled with pre-serialized JSON via safe_substitute; literal braces need no escaping
+_FINOPS_PROMPT = string.Template("""You are a Senior Azure FinOps Architect.
 
   Your responsibility is STRICTLY cost optimization.
   You are NOT a performance engineer.
@@ -22,11 +21,11 @@ def finops_agent(azure_metrics: dict, azure_cost: dict):
 
   -----------------------------------
   AZURE RUNTIME METRICS:
-  {azure_metrics}
+  ${azure_metrics}
 
   -----------------------------------
   AZURE COST DATA:
-  {azure_cost}
+  ${azure_cost}
   -----------------------------------
 
   Your Objective:
@@ -97,62 +96,104 @@ def finops_agent(azure_metrics: dict, azure_cost: dict):
 
   Each object must follow:
 
-  {{
+  {
     "issue_detected": string,
     "recommendation": string,
     "estimated_savings": string,
     "risk_level": string,
     "affected_services": [string],
     "confidence_level": string
-  }}
+  }
 
   No markdown.
   No commentary.
   No explanation outside JSON.
-  """
+  """)
+
+
+_CACHE_VERSION = cache_version(_FINOPS_PROMPT.template, finops_proposals_validator.json_schema(), DEFAULT_MODEL)
+
+
+def _cache_key(analysis_context: AnalysisContext) -> str:
+  return f"finops:{_CACHE_VERSION}:{content_hash({'azure_metrics': analysis_context['azure_metrics'], 'azure_cost': analysis_context['azure_cost']})}"
+
+
+def _build_prompt(analysis_context: AnalysisContext) -> str:
+  return _FINOPS_PROMPT.safe_substitute(
+      azure_metrics=analysis_context["azure_metrics_json"],
+      azure_cost=analysis_context["azure_cost_json"],
+  )
+
+
+def _parse_response(response, cache_key: str) -> dict:
+  response_text = response.content.strip() if response and response.content else ""
+  
+  if not response_text:
+      return {
+          "analysis_status": "failed",
+          "error": "FinOps agent received empty response from LLM",
+          "cost_inefficiencies": [],
+      }
+  
+  proposals = []
   try:
-      response = llm.invoke(prompt)
-      response_text = response.content.strip() if response and response.content else ""
-      
-      if not response_text:
-          return {
-              "analysis_status": "failed",
-              "error": "FinOps agent received empty response from LLM",
-              "cost_inefficiencies": [],
-          }
-      
-      proposals = []
-      try:
-          start_idx = response_text.find('[')
-          end_idx = response_text.rfind(']') + 1
-          if start_idx != -1 and end_idx > start_idx:
-              json_str = response_text[start_idx:end_idx]
-              proposals = json.loads(json_str)
-          else:
-              proposals = json.loads(response_text)
-          
-          if not isinstance(proposals, list):
-              return {
-                  "analysis_status": "failed",
-                  "error": "FinOps agent returned non-array JSON",
-                  "raw_response": response_text[:2000],
-                  "cost_inefficiencies": [],
-              }
-      except json.JSONDecodeError as e:
-          return {
-              "analysis_status": "failed",
-              "error": f"Failed to parse FinOps JSON: {str(e)[:200]}",
-              "raw_response": response_text[:2000],
-              "cost_inefficiencies": [],
-          }
-      
+      json_str = first_json_array(response_text)
+      proposals = orjson.loads(json_str if json_str is not None else response_text)
+      finops_proposals_validator.validate_python(proposals)
+  except ValidationError as e:
       return {
-          "cost_inefficiencies": proposals,
-          "analysis_status": "completed"
+          "analysis_status": "failed",
+          "error": f"FinOps agent returned JSON not matching the proposal schema: {str(e)[:200]}",
+          "raw_response": response_text[:2000],
+          "cost_inefficiencies": [],
       }
-  except Exception as e:
+  except orjson.JSONDecodeError as e:
       return {
           "analysis_status": "failed",
-          "error": f"FinOps analysis failed: {str(e)[:200]}",
+          "error": f"Failed to parse FinOps JSON: {str(e)[:200]}",
+          "raw_response": response_text[:2000],
           "cost_inefficiencies": [],
-      }
\ No newline at end of file
+      }
+  
+  output = {
+      "cost_inefficiencies": proposals,
+      "analysis_status": "completed"
+  }
+  response_cache.set(cache_key, output)
+  remember_completion(response)
+  return output
+
+
+def _failure(e: Exception) -> dict:
+  return {
+      "analysis_status": "failed",
+      "error": f"FinOps analysis failed: {str(e)[:200]}",
+      "cost_inefficiencies": [],
+  }
+
+
+def finops_agent(analysis_context: AnalysisContext):
+  cache_key = _cache_key(analysis_context)
+  cached_output = response_cache.get(cache_key)
+  if cached_output is not None:
+      return cached_output
+
+  try:
+      # Reading stops as soon as the proposals array closes
+      response = stream_llm_json(_build_prompt(analysis_context), "[", "]")
+      return _parse_response(response, cache_key)
+  except Exception as e:
+      return _failure(e)
+
+
+async def afinops_agent(analysis_context: AnalysisContext):
+  cache_key = _cache_key(analysis_context)
+  cached_output = response_cache.get(cache_key)
+  if cached_output is not None:
+      return cached_output
+
+  try:
+      response = await astream_llm_json(_build_prompt(analysis_context), "[", "]")
+      return _parse_response(response, cache_key)
+  except Exception as e:
+      return _failure(e)
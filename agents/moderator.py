@@ -1,16 +1,16 @@
-import os
-import json
-from dotenv import load_dotenv
-from langchain_groq import ChatGroq
-from agents.finops import finops_agent
+import asyncio
+import string
+from typing import List, Tuple
+import orjson
+from pydantic import ValidationError
+from agents._llm import DEFAULT_MODEL, invoke_llm, ainvoke_llm, remember_completion
+from agents._cache import response_cache, content_hash, cache_version
+from agents._json import first_json_array, first_json_object
+from agents._schemas import moderator_evaluation_validator
 
-load_dotenv()
-
-os.environ["GROQ_API_KEY"] = os.getenv("GROQ_API_KEY")
-llm = ChatGroq(model_name="llama-3.1-8b-instant", temperature=0.5)
-
-def moderator_agent(finops_output, architecture_output, performance_output):
-    prompt = f"""You are an Autonomous SRE Decision Engine.
+# Prompt sections shared by the single and batched moderator prompts.
+# Filled with pre-serialized JSON via safe_substitute; literal braces need no escaping
+_ROLE = """You are an Autonomous SRE Decision Engine.
     Your role is to synthesize and prioritize recommendations from:
 
     1) Architecture Agent
@@ -30,22 +30,26 @@ def moderator_agent(finops_output, architecture_output, performance_output):
 
     -------------------------------------------------
 
-    ARCHITECTURE AGENT OUTPUT:
-    {architecture_output}
+"""
+
+_AGENT_OUTPUTS = """    ARCHITECTURE AGENT OUTPUT:
+    ${architecture_output}
 
     -------------------------------------------------
 
     PERFORMANCE AGENT OUTPUT:
-    {performance_output}
+    ${performance_output}
 
     -------------------------------------------------
 
     FINOPS AGENT OUTPUT:
-    {finops_output}
+    ${finops_output}
 
     -------------------------------------------------
 
-    Your Responsibilities:
+"""
+
+_GUIDELINES = """    Your Responsibilities:
 
     1. Identify Conflicts
     - If FinOps suggests scaling down but Performance indicates high utilization → flag conflict.
@@ -83,20 +87,18 @@ def moderator_agent(finops_output, architecture_output, performance_output):
 
     -------------------------------------------------
 
-    Return ONLY a valid JSON object.
-
-    Structure:
+"""
 
-    {{
+_OUTPUT_STRUCTURE = """    {
     "conflicts_detected": [
-        {{
+        {
         "description": string,
         "agents_involved": [string],
         "resolution_decision": string
-        }}
+        }
     ],
     "ranked_recommendations": [
-        {{
+        {
         "rank": integer,
         "recommendation": string,
         "impact": string,
@@ -104,22 +106,222 @@ def moderator_agent(finops_output, architecture_output, performance_output):
         "cost_benefit": string,
         "implementation_effort": string,
         "rationale": string
-        }}
+        }
     ],
-    "implementation_plan": {{
+    "implementation_plan": {
         "immediate_actions": [string],
         "short_term": [string],
         "long_term": [string]
-    }}
-    }}
-    No markdown.
+    }
+    }
+"""
+
+_OUTPUT_RULES = """    No markdown.
     No commentary.
     No explanation outside JSON.
     """
-    
-    response = llm.invoke(prompt)
+
+_MODERATOR_PROMPT = string.Template(
+    _ROLE + _AGENT_OUTPUTS + _GUIDELINES
+    + """    Return ONLY a valid JSON object.\n\n    Structure:\n\n"""
+    + _OUTPUT_STRUCTURE + _OUTPUT_RULES
+)
+
+# One prompt for several independent systems: amortizes the shared instructions and cuts API calls from N to N/b
+_MODERATOR_BATCH_PROMPT = string.Template(
+    _ROLE
+    + """    You will analyze ${count} INDEPENDENT systems. Reason over each system's agent outputs
+    separately; never carry findings from one system into another.
+
+${systems}
+"""
+    + _GUIDELINES
+    + """    Return ONLY a valid JSON array of exactly ${count} objects, one per system,
+    in the same order as the systems above.
+
+    Each object must follow:
+
+"""
+    + _OUTPUT_STRUCTURE + _OUTPUT_RULES
+)
+
+_SYSTEM_OUTPUTS = string.Template("""    ### SYSTEM ${index}
+
+""" + _AGENT_OUTPUTS)
+
+DEFAULT_BATCH_SIZE = 4
+
+
+# Single and batched calls share cache entries, so both templates are part of the version
+_CACHE_VERSION = cache_version(
+    _MODERATOR_PROMPT.template, _MODERATOR_BATCH_PROMPT.template, _SYSTEM_OUTPUTS.template,
+    moderator_evaluation_validator.json_schema(), DEFAULT_MODEL,
+)
+
+
+def _cache_key(finops_output, architecture_output, performance_output) -> str:
+    return f"moderator:{_CACHE_VERSION}:" + content_hash({
+        "finops_output": finops_output,
+        "architecture_output": architecture_output,
+        "performance_output": performance_output,
+    })
+
+
+def _build_prompt(finops_output, architecture_output, performance_output) -> str:
+    return _MODERATOR_PROMPT.safe_substitute(
+        finops_output=orjson.dumps(finops_output).decode(),
+        architecture_output=orjson.dumps(architecture_output).decode(),
+        performance_output=orjson.dumps(performance_output).decode(),
+    )
+
+
+def _parse_response(response, cache_key: str):
     response_text = response.content.strip()
-    evaluation = json.loads(response_text)
+    json_str = first_json_object(response_text)
+    evaluation = orjson.loads(json_str if json_str is not None else response_text)
+    moderator_evaluation_validator.validate_python(evaluation)
+    response_cache.set(cache_key, evaluation)
+    remember_completion(response)
     return evaluation
 
 
+def moderator_agent(finops_output, architecture_output, performance_output):
+    cache_key = _cache_key(finops_output, architecture_output, performance_output)
+    cached_evaluation = response_cache.get(cache_key)
+    if cached_evaluation is not None:
+        return cached_evaluation
+
+    response = invoke_llm(_build_prompt(finops_output, architecture_output, performance_output))
+    return _parse_response(response, cache_key)
+
+
+async def amoderator_agent(finops_output, architecture_output, performance_output):
+    cache_key = _cache_key(finops_output, architecture_output, performance_output)
+    cached_evaluation = response_cache.get(cache_key)
+    if cached_evaluation is not None:
+        return cached_evaluation
+
+    response = await ainvoke_llm(_build_prompt(finops_output, architecture_output, performance_output))
+    return _parse_response(response, cache_key)
+
+
+# (finops_output, architecture_output, performance_output) for one system
+ModeratorInputs = Tuple[dict, dict, dict]
+
+
+def _build_batch_prompt(batch: List[ModeratorInputs]) -> str:
+    systems = "\n".join(
+        _SYSTEM_OUTPUTS.safe_substitute(
+            index=index,
+            finops_output=orjson.dumps(finops_output).decode(),
+            architecture_output=orjson.dumps(architecture_output).decode(),
+            performance_output=orjson.dumps(performance_output).decode(),
+        )
+        for index, (finops_output, architecture_output, performance_output) in enumerate(batch, 1)
+    )
+    return _MODERATOR_BATCH_PROMPT.safe_substitute(count=len(batch), systems=systems)
+
+
+def _parse_batch_response(response, cache_keys: List[str]):
+    """
+    Split a batched response back into one evaluation per system, or None if it cannot be trusted.
+    """
+    response_text = response.content.strip()
+    json_str = first_json_array(response_text)
+    try:
+        evaluations = orjson.loads(json_str if json_str is not None else response_text)
+    except orjson.JSONDecodeError:
+        return None
+    if not isinstance(evaluations, list) or len(evaluations) != len(cache_keys):
+        return None
+    try:
+        for evaluation in evaluations:
+            moderator_evaluation_validator.validate_python(evaluation)
+    except ValidationError:
+        return None
+
+    for cache_key, evaluation in zip(cache_keys, evaluations):
+        response_cache.set(cache_key, evaluation)
+    remember_completion(response)
+    return evaluations
+
+
+def _pending_batches(items: List[ModeratorInputs], batch_size: int):
+    """
+    Fill cache hits into results and yield (indices, inputs, cache_keys) chunks for the misses.
+    """
+    results = [None] * len(items)
+    pending = []
+    for index, inputs in enumerate(items):
+        cache_key = _cache_key(*inputs)
+        cached_evaluation = response_cache.get(cache_key)
+        if cached_evaluation is not None:
+            results[index] = cached_evaluation
+        else:
+            pending.append((index, inputs, cache_key))
+
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    return results, [tuple(map(list, zip(*batch))) for batch in batches]
+
+
+def _moderate_one(inputs: ModeratorInputs):
+    # Fallback for a single system: its failure must not discard the other systems' results
+    try:
+        return moderator_agent(*inputs)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+async def _amoderate_one(inputs: ModeratorInputs):
+    try:
+        return await amoderator_agent(*inputs)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def moderator_agent_batched(items: List[ModeratorInputs], batch_size: int = DEFAULT_BATCH_SIZE):
+    """
+    Moderate several independent systems with one LLM call per batch_size systems.
+    Falls back to per-system calls for a batch whose response does not split cleanly;
+    a system that still fails gets an {"error": ...} entry at its own index.
+    """
+    results, batches = _pending_batches(items, batch_size)
+    for indices, batch, cache_keys in batches:
+        evaluations = None
+        if len(batch) > 1:
+            try:
+                response = invoke_llm(_build_batch_prompt(batch))
+                evaluations = _parse_batch_response(response, cache_keys)
+            except Exception:
+                evaluations = None
+        if evaluations is None:
+            evaluations = [_moderate_one(inputs) for inputs in batch]
+        for index, evaluation in zip(indices, evaluations):
+            results[index] = evaluation
+    return results
+
+
+async def _amoderate_batch(batch: List[ModeratorInputs], cache_keys: List[str]):
+    if len(batch) > 1:
+        try:
+            response = await ainvoke_llm(_build_batch_prompt(batch))
+            evaluations = _parse_batch_response(response, cache_keys)
+        except Exception:
+            evaluations = None
+        if evaluations is not None:
+            return evaluations
+    return await asyncio.gather(*(_amoderate_one(inputs) for inputs in batch))
+
+
+async def amoderator_agent_batched(items: List[ModeratorInputs], batch_size: int = DEFAULT_BATCH_SIZE):
+    """
+    Async moderator_agent_batched; the batches themselves are sent concurrently.
+    """
+    results, batches = _pending_batches(items, batch_size)
+    batch_results = await asyncio.gather(
+        *(_amoderate_batch(batch, cache_keys) for _, batch, cache_keys in batches)
+    )
+    for (indices, _, _), evaluations in zip(batches, batch_results):
+        for index, evaluation in zip(indices, evaluations):
+            results[index] = evaluation
+    return results
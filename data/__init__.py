@@ -8,7 +8,9 @@ This package handles:
 """
 
 from data.github_extractor import extract_repo_code
+from data.code_digest import digest_code_files
 
 __all__ = [
     'extract_repo_code',
+    'digest_code_files',
 ]
@@ -0,0 +1,97 @@
+"""
+Cheap pre-pass that condenses extracted repository files before they reach the LLM.
+Keeps only the lines that carry architectural signal so the code summarizer prompt stays small.
+"""
+
+import hashlib
+import re
+from typing import Dict, List
+
+try:
+    # Optional: linear-time DFA matching for very large generated Terraform (pip install google-re2)
+    import re2 as _resource_re
+except ImportError:
+    _resource_re = re
+
+MAX_CONFIG_CHARS = 1500  # Dockerfiles, CI pipelines, manifests: kept verbatim up to this size
+
+CODE_EXTENSIONS = (".py", ".js", ".ts", ".java", ".go")
+
+# Application source lines worth keeping: imports, decorators/annotations (routes, caching, DI),
+# function/class signatures, express-style routes, inline SQL, environment configuration,
+# middleware/CORS/config calls and secret-looking assignments (for secrets_hardcoded / cors_configured).
+# Matched on raw bytes so only the kept lines are ever decoded.
+_SOURCE_SIGNAL_RE = re.compile(
+    rb"^[ \t]*(?:"
+    rb"(?:from[ \t]+\S+[ \t]+)?import\b"
+    rb"|.*\brequire\("
+    rb"|@\w[\w.]*"
+    rb"|(?:export[ \t]+)?(?:async[ \t]+)?(?:def|function|func|class)\b"
+    rb"|.*\b(?:app|router)\.(?:get|post|put|patch|delete|use)\("
+    rb"|.*\b(?:SELECT|INSERT|UPDATE|DELETE)\b"
+    rb"|.*\b(?:os\.getenv|os\.environ|process\.env)\b"
+    rb"|.*\b(?:add_middleware|middleware|configure|CORS\w*|cors)\("
+    rb"|.*\.config(?:\[|\.)"
+    rb"|.*(?:(?:\b|_)(?i:key|secret|password|passwd|pwd|token|credentials?)|[a-z](?:Key|Secret|Password|Token))"
+    rb"['\"]?[ \t]*[:=](?!=)"
+    rb")[^\n]*",
+    re.MULTILINE,
+)
+
+# Terraform block headers and scalar attribute assignments (SKUs, tiers, flags, sizes)
+_TERRAFORM_SIGNAL_RE = re.compile(
+    r'^[ \t]*(?:(?:resource|provider|module|data)[ \t]+"[^"]+"'
+    r'|\w+[ \t]*=[ \t]*(?:"[^"]*"|true|false|\d+))[^\n]*',
+    re.MULTILINE,
+)
+
+# No lookarounds or backreferences, so re2 accepts the pattern verbatim
+_TERRAFORM_RESOURCE_RE = _resource_re.compile(r'resource\s+"([^"]+)"\s+"([^"]+)"')
+
+# Bump when digest_file's output layout changes without a pattern change
+DIGEST_FORMAT = 1
+
+# Short hash of everything a digest depends on besides the file; part of the per-file cache key,
+# so editing a signal pattern re-digests files that are already cached
+DIGEST_VERSION = hashlib.blake2b(
+    "\0".join((
+        str(DIGEST_FORMAT), str(MAX_CONFIG_CHARS), ",".join(CODE_EXTENSIONS),
+        _SOURCE_SIGNAL_RE.pattern.decode(), _TERRAFORM_SIGNAL_RE.pattern, _TERRAFORM_RESOURCE_RE.pattern,
+    )).encode(),
+    digest_size=8,
+).hexdigest()
+
+
+def extract_terraform_resources(terraform_content: str) -> Dict[str, List[str]]:
+    """
+    Group declared Terraform resources by provider, e.g. {"azurerm": ["azurerm_linux_web_app.api"]}
+    """
+    resources = {}
+    for match in _TERRAFORM_RESOURCE_RE.finditer(terraform_content):
+        resource_type, resource_name = match.groups()
+        resources.setdefault(resource_type.partition("_")[0], []).append(f"{resource_type}.{resource_name}")
+    return resources
+
+
+def digest_file(path: str, content: bytes) -> str:
+    """
+    Condense a single file (raw bytes as downloaded) to its signal-carrying lines, prefixed with its path
+    """
+    if path.endswith(CODE_EXTENSIONS):
+        lines = [line.strip().decode("utf-8", errors="replace") for line in _SOURCE_SIGNAL_RE.findall(content)]
+    elif path.endswith(".tf"):
+        text = content.decode("utf-8", errors="replace")
+        resources = extract_terraform_resources(text)
+        lines = [f"resources: {resources}"] + [line.strip() for line in _TERRAFORM_SIGNAL_RE.findall(text)]
+    else:
+        # Config and CI/CD files are small and almost entirely signal
+        lines = [content[:MAX_CONFIG_CHARS].decode("utf-8", errors="replace").strip()]
+
+    return f"### {path}\n" + "\n".join(lines)
+
+
+def digest_code_files(code_files: Dict[str, bytes]) -> str:
+    """
+    Condense every extracted file and join them into a single prompt-ready string
+    """
+    return "\n\n".join(digest_file(path, content) for path, content in sorted(code_files.items()))
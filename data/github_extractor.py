@@ -1,8 +1,24 @@
+import asyncio
+import atexit
+import os
+import time
 import httpx
 import re
+from urllib.parse import quote
+import diskcache
+import orjson
+from dotenv import load_dotenv
+from agents._cache import CACHE_DIR
+
+load_dotenv()
 
 GITHUB_API = "https://api.github.com"
+GITHUB_RAW = "https://raw.githubusercontent.com"
+REPO_REF = "HEAD"  # Default branch; resolved to one commit SHA per crawl (see resolve_commit_sha)
 MAX_FILE_SIZE = 200_000  # 200 KB per file limit
+MAX_CONNECTIONS = 32
+MAX_CONCURRENT_DOWNLOADS = 32  # Raw downloads don't count against the REST API rate limit
+MAX_RATE_LIMIT_WAIT = 60  # Seconds; a later rate-limit reset fails fast instead of stalling the analysis
 ALLOWED_EXTENSIONS = {".py", ".js", ".ts", ".java", ".go", ".tf", ".json"}
 
 # CI/CD files to extract (by exact name or pattern)
@@ -21,12 +37,38 @@ CICD_FILES = {
     "docker-compose.yml", "docker-compose.yaml"
 }
 
+_HEADERS = {"Accept": "application/vnd.github+json"}
+if os.getenv("GITHUB_TOKEN"):
+    # Authenticated calls get 5000 requests/hour instead of 60
+    _HEADERS["Authorization"] = f"Bearer {os.getenv('GITHUB_TOKEN')}"
+
+# Connection settings shared by the sync API client and the per-crawl download client
+_CLIENT_OPTIONS = {
+    "http2": True,
+    "headers": _HEADERS,
+    "timeout": 30.0,
+    "follow_redirects": True,
+}
+
+# Long-lived client for api.github.com so keep-alive connections survive across analyses
+_CLIENT = httpx.Client(**_CLIENT_OPTIONS)
+atexit.register(_CLIENT.close)
+
+# Tree url -> (etag, body) from previous crawls, revalidated with If-None-Match.
+# Raw files are only downloaded when their SHA changed, so they are fetched unconditionally.
+_ETAG_CACHE = diskcache.Cache(os.path.join(CACHE_DIR, "github_etags"))
+
+_GH_URL_RE = re.compile(r"github\.com/([^/]+)/([^/]+)")
+_ALLOWED_EXT_TUPLE = tuple(ALLOWED_EXTENSIONS)
+_CICD_FILES_FZ = frozenset(CICD_FILES)
+# Path fragments that mark CI/CD configuration regardless of file name
+_CICD_PATTERNS = (".github/workflows/", ".gitlab/", ".circleci/", ".github/")
+
 def parse_github_url(repo_url: str):
     """
     Extract owner and repo from GitHub URL
     """
-    pattern = r"github\.com/([^/]+)/([^/]+)"
-    match = re.search(pattern, repo_url)
+    match = _GH_URL_RE.search(repo_url)
     if not match:
         raise ValueError("Invalid GitHub URL")
     owner = match.group(1)
@@ -34,15 +76,68 @@ def parse_github_url(repo_url: str):
     return owner, repo
 
 
-def fetch_repo_contents(owner: str, repo: str, path: str = ""):
+def _conditional_headers(url: str):
+    cached = _ETAG_CACHE.get(url)
+    return cached, ({"If-None-Match": cached[0]} if cached else {})
+
+
+def _resolve_conditional(url: str, cached, response: httpx.Response) -> bytes:
     """
-    Fetch contents of a repo path
+    Return the cached body on 304 Not Modified, otherwise store the fresh body under its ETag
     """
-    url = f"{GITHUB_API}/repos/{owner}/{repo}/contents/{path}"
-    with httpx.Client() as client:
-        response =  client.get(url)
-        response.raise_for_status()
-        return response.json()
+    if response.status_code == 304 and cached:
+        return cached[1]
+    response.raise_for_status()
+    etag = response.headers.get("ETag")
+    if etag:
+        _ETAG_CACHE.set(url, (etag, response.content))
+    return response.content
+
+
+def _get_with_rate_limit(url: str, headers: dict) -> httpx.Response:
+    """
+    GET through the shared API client; if the rate limit is exhausted and resets soon, sleep once and retry
+    """
+    response = _CLIENT.get(url, headers=headers)
+    if response.status_code in (403, 429) and response.headers.get("X-RateLimit-Remaining") == "0":
+        wait = int(response.headers.get("X-RateLimit-Reset", 0)) - time.time()
+        if 0 < wait <= MAX_RATE_LIMIT_WAIT:
+            time.sleep(wait)
+            response = _CLIENT.get(url, headers=headers)
+    return response
+
+
+def conditional_get(url: str) -> bytes:
+    """
+    GET through the shared API client, revalidating any stored ETag
+    """
+    cached, headers = _conditional_headers(url)
+    return _resolve_conditional(url, cached, _get_with_rate_limit(url, headers))
+
+
+def _api_get(url: str) -> bytes:
+    try:
+        return conditional_get(url)
+    except httpx.HTTPStatusError as e:
+        # The first API call doubles as the accessibility probe: missing/private repos fail here
+        raise ValueError(f"Repo not accessible: {e.response.status_code}") from e
+
+
+def resolve_commit_sha(owner: str, repo: str) -> str:
+    """
+    Pin the default branch to its current commit, so the tree listing and every raw download
+    read the same snapshot even if someone pushes mid-crawl
+    """
+    return orjson.loads(_api_get(f"{GITHUB_API}/repos/{owner}/{repo}/commits/{REPO_REF}"))["sha"]
+
+
+def fetch_repo_tree(owner: str, repo: str, ref: str = REPO_REF):
+    """
+    Fetch the full file tree at the given ref (default branch by default) in a single request
+    """
+    body = _api_get(f"{GITHUB_API}/repos/{owner}/{repo}/git/trees/{ref}?recursive=1")
+    # GitHub truncates trees above 100k entries / 7 MB; the entries returned are still valid
+    return orjson.loads(body).get("tree", [])
 
 
 def is_allowed_file(file_name: str, file_path: str = "") -> bool:
@@ -50,69 +145,93 @@ def is_allowed_file(file_name: str, file_path: str = "") -> bool:
     Check if file should be extracted based on extension or CI/CD naming
     """
     # Check standard extensions
-    if any(file_name.endswith(ext) for ext in ALLOWED_EXTENSIONS):
+    if file_name.endswith(_ALLOWED_EXT_TUPLE):
         return True
-    
+
     # Check CI/CD files by name
-    if file_name in CICD_FILES:
+    if file_name in _CICD_FILES_FZ:
         return True
-    
+
     # Check for CI/CD files in specific paths
-    cicd_patterns = [
-        ".github/workflows/",
-        ".gitlab/",
-        ".circleci/",
-        ".github/",
-    ]
-    
     full_path = file_path or file_name
-    if any(pattern in full_path for pattern in cicd_patterns):
-        return True
-    
-    return False
+    return any(pattern in full_path for pattern in _CICD_PATTERNS)
 
 
-def extract_repo_code(repo_url: str):
+async def download_files(client: httpx.AsyncClient, owner: str, repo: str, paths: list, ref: str = REPO_REF):
     """
-    Main function:
-    Recursively extract allowed files from public GitHub repo
+    Download raw file contents for the given repo paths as one concurrent batch.
+    Files that fail to download are left out of the result.
     """
-    owner, repo = parse_github_url(repo_url)
     collected_files = {}
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
 
-    def recursive_fetch(path=""):
-        items =  fetch_repo_contents(owner, repo, path)
+    async def download(path):
+        url = f"{GITHUB_RAW}/{owner}/{repo}/{ref}/{quote(path)}"
+        try:
+            async with semaphore:
+                response = await client.get(url)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            # One unreadable file should not abort the whole crawl
+            print(f"⚠️ Skipping {path}: {e}")
+            return
+        # Kept as bytes; consumers decode only what they put in a prompt
+        collected_files[path] = response.content
 
-        if isinstance(items, dict) and items.get("type") == "file":
-            # Single file
-             process_file(items)
-             return
+    await asyncio.gather(*[download(path) for path in paths])
+    return collected_files
 
-        for item in items:
-            if item["type"] == "dir":
-                 recursive_fetch(item["path"])
 
-            elif item["type"] == "file":
-                 process_file(item)
+def list_repo_files(repo_url: str):
+    """
+    Map every extractable file path to its blob SHA without downloading any content.
+    Returns (commit_sha, {path: blob sha}); pass commit_sha to the download functions
+    so the contents match the listed SHAs.
+    """
+    owner, repo = parse_github_url(repo_url)
+    commit_sha = resolve_commit_sha(owner, repo)
+    tree = fetch_repo_tree(owner, repo, commit_sha)
 
-    def process_file(file_item):
-        file_name = file_item["name"]
-        file_path = file_item.get("path", "")
+    # Filter by type, size and extension / CI/CD naming before downloading anything
+    return commit_sha, {
+        entry["path"]: entry["sha"]
+        for entry in tree
+        if entry["type"] == "blob"
+        and entry.get("size", 0) <= MAX_FILE_SIZE
+        and is_allowed_file(entry["path"].rsplit("/", 1)[-1], entry["path"])
+    }
 
-        # Filter by extension or CI/CD naming
-        if not is_allowed_file(file_name, file_path):
-            return
 
-        # Skip large files
-        if file_item.get("size", 0) > MAX_FILE_SIZE:
-            return
+async def adownload_repo_files(repo_url: str, paths: list, ref: str = REPO_REF):
+    """
+    Download only the given paths at ref, e.g. the files whose SHA changed since the last run
+    """
+    if not paths:
+        return {}
+    owner, repo = parse_github_url(repo_url)
+    async with httpx.AsyncClient(**_CLIENT_OPTIONS, limits=httpx.Limits(max_connections=MAX_CONNECTIONS)) as client:
+        return await download_files(client, owner, repo, paths, ref)
 
-        # Download raw file
-        with httpx.Client() as client:
-            response =  client.get(file_item["download_url"])
-            response.raise_for_status()
-            collected_files[file_item["path"]] = response.text
 
-    recursive_fetch()
+def download_repo_files(repo_url: str, paths: list, ref: str = REPO_REF):
+    """
+    Sync wrapper around adownload_repo_files
+    """
+    return asyncio.run(adownload_repo_files(repo_url, paths, ref))
 
-    return collected_files
\ No newline at end of file
+
+async def aextract_repo_code(repo_url: str):
+    """
+    Async variant of extract_repo_code.
+    Pins the default branch to one commit, lists its whole tree in one call, then downloads the allowed files concurrently.
+    """
+    commit_sha, file_shas = await asyncio.to_thread(list_repo_files, repo_url)
+    return await adownload_repo_files(repo_url, list(file_shas), commit_sha)
+
+
+def extract_repo_code(repo_url: str):
+    """
+    Main function:
+    Extract allowed files from public GitHub repo as {path: raw bytes}
+    """
+    return asyncio.run(aextract_repo_code(repo_url))
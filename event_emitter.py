@@ -1,14 +1,20 @@
 """
 Event emitter for agent completion tracking.
 Provides a thread-safe way to emit agent events from the synchronous workflow.
+The target queue is held in a context variable, so concurrent requests each see their own.
 """
 
 import asyncio
+import contextvars
 from typing import Optional, Dict, Callable
 from queue import Queue
 import threading
 
 
+# Set per request (see main.run_workflow_with_events); tasks and to_thread calls inherit it
+_event_queue: contextvars.ContextVar[Optional[Queue]] = contextvars.ContextVar("agent_event_queue", default=None)
+
+
 class AgentEventEmitter:
     """
     Emits events when agents complete.
@@ -16,27 +22,37 @@ class AgentEventEmitter:
     """
     
     def __init__(self):
-        # Queue to store events from the synchronous workflow
-        self.event_queue: Optional[Queue] = None
         # Callback functions for async handling
         self.callbacks: Dict[str, Callable] = {}
     
+    @property
+    def event_queue(self) -> Optional[Queue]:
+        """Event queue of the current request, if any."""
+        return _event_queue.get()
+    
     def set_event_queue(self, queue: Queue):
-        """Set the event queue for async processing."""
-        self.event_queue = queue
+        """Set the event queue for async processing in the current context (request)."""
+        _event_queue.set(queue)
+    
+    def _put(self, event: Dict, repo_url: Optional[str]):
+        # Tag the event with its repository so clients can tell concurrent (batch) runs apart
+        if repo_url:
+            event["repo_url"] = repo_url
+        event_queue = self.event_queue
+        if event_queue:
+            event_queue.put(event)
     
-    def emit_agent_started(self, agent_name: str):
+    def emit_agent_started(self, agent_name: str, repo_url: Optional[str] = None):
         """Emit when an agent starts."""
         event = {
             "type": "agent_started",
             "agent": agent_name,
             "status": "in_progress"
         }
-        if self.event_queue:
-            self.event_queue.put(event)
+        self._put(event, repo_url)
         print(f"📤 Event emitted: {agent_name} started")
     
-    def emit_agent_completed(self, agent_name: str, output: Dict):
+    def emit_agent_completed(self, agent_name: str, output: Dict, repo_url: Optional[str] = None):
         """Emit when an agent completes."""
         event = {
             "type": "agent_completed",
@@ -44,11 +60,10 @@ class AgentEventEmitter:
             "status": "completed",
             "output": output
         }
-        if self.event_queue:
-            self.event_queue.put(event)
+        self._put(event, repo_url)
         print(f"📤 Event emitted: {agent_name} completed")
     
-    def emit_agent_error(self, agent_name: str, error: str):
+    def emit_agent_error(self, agent_name: str, error: str, repo_url: Optional[str] = None):
         """Emit when an agent encounters an error."""
         event = {
             "type": "agent_error",
@@ -56,8 +71,7 @@ class AgentEventEmitter:
             "status": "error",
             "error": error
         }
-        if self.event_queue:
-            self.event_queue.put(event)
+        self._put(event, repo_url)
         print(f"📤 Event emitted: {agent_name} error - {error}")
 
 
@@ -1,188 +1,309 @@
-import json
 import os
-from langgraph.graph import StateGraph, END
-from state import State
-from agents.code_summarizer import code_summarizer_agent
-from agents.moderator import moderator_agent
-from agents.finops import finops_agent
-from agents.architecture import architecture_agent
-from agents.performance import performance_agent
+import orjson
+from pathlib import Path
+from langgraph.graph import StateGraph, START, END
+from state import State, AnalysisContext
+from agents.code_summarizer import acode_summarizer_agent
+from agents.moderator import amoderator_agent, amoderator_agent_batched
+from agents.finops import afinops_agent
+from agents.architecture import aarchitecture_agent
+from agents.performance import aperformance_agent
+from agents.combined import acombined_agent
 from event_emitter import agent_emitter
 
 
-def _load_json_if_present(path: str) -> dict:
-    if not os.path.exists(path) or os.path.getsize(path) == 0:
+# "fast": one combined LLM call after the code summarizer; "quality": separate specialist agents + moderator
+ANALYSIS_MODES = ("fast", "quality")
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "fast").strip().lower()
+if ANALYSIS_MODE not in ANALYSIS_MODES:
+    # A typo must not silently select quality mode (about four times the LLM calls)
+    raise ValueError(f"ANALYSIS_MODE must be one of {', '.join(ANALYSIS_MODES)}; got {ANALYSIS_MODE!r}")
+
+COMBINED_AGENTS = ("architecture", "performance", "finops", "moderator")
+
+
+def _load_json_if_present(path: Path) -> dict:
+    if not path.is_file():
         return {}
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            return data if isinstance(data, dict) else {}
+        data = orjson.loads(path.read_text(encoding="utf-8", errors="replace"))
+        return data if isinstance(data, dict) else {}
     except Exception:
         return {}
 
 
-def code_summarizer_node(state: State) -> dict:
+DATA_DIR = Path(__file__).parent / "data"
+
+
+def load_analysis_context() -> AnalysisContext:
+    """
+    Load the Azure metrics and cost data and serialize them for the agent prompts.
+    Built once per run (see main._initial_state) and shared through state by every agent.
+    """
+    azure_metrics = _load_json_if_present(DATA_DIR / "azure_metrics.json")
+    azure_cost = _load_json_if_present(DATA_DIR / "azure_cost.json")
+    return {
+        "azure_metrics": azure_metrics,
+        "azure_cost": azure_cost,
+        "azure_metrics_json": orjson.dumps(azure_metrics).decode(),
+        "azure_cost_json": orjson.dumps(azure_cost).decode(),
+    }
+
+
+def _analysis_context(state: State) -> AnalysisContext:
+    return state.analysis_context or load_analysis_context()
+
+
+async def code_summarizer_node(state: State) -> dict:
     """
     Execute code summarizer agent with the repository URL.
     Stores the output in state for downstream agents.
     """
-    print(f"🔍 Running Code Summarizer on: {state['repo_url']}")
-    agent_emitter.emit_agent_started("code_summarizer")
+    print(f"🔍 Running Code Summarizer on: {state.repo_url}")
+    agent_emitter.emit_agent_started("code_summarizer", state.repo_url)
     
     try:
-        output = code_summarizer_agent(state, state['repo_url'])
+        output = await acode_summarizer_agent(state, state.repo_url)
         print("✅ Code Summarizer completed")
-        agent_emitter.emit_agent_completed("code_summarizer", output)
+        agent_emitter.emit_agent_completed("code_summarizer", output, state.repo_url)
         return {"code_summarizer_output": output}
     except Exception as e:
         print(f"❌ Code Summarizer failed: {str(e)}")
-        agent_emitter.emit_agent_error("code_summarizer", str(e))
+        agent_emitter.emit_agent_error("code_summarizer", str(e), state.repo_url)
         return {"code_summarizer_output": {"error": str(e)}}
 
 
-def architecture_node(state: State) -> dict:
+async def architecture_node(state: State) -> dict:
     """
     Execute architecture agent.
     Takes code_summarizer_output as input for analysis.
     """
     print("🏗️ Running Architecture Agent")
-    agent_emitter.emit_agent_started("architecture")
+    agent_emitter.emit_agent_started("architecture", state.repo_url)
     
     try:
-        data_dir = os.path.join(os.path.dirname(__file__), "data")
-        azure_metrics = _load_json_if_present(os.path.join(data_dir, "azure_metrics.json"))
-        azure_cost = _load_json_if_present(os.path.join(data_dir, "azure_cost.json"))
-        code_summary = state.get("code_summarizer_output", {}) or {}
+        code_summary = state.code_summarizer_output or {}
 
-        output = architecture_agent(code_summary, azure_metrics, azure_cost)
+        output = await aarchitecture_agent(code_summary, _analysis_context(state))
         print("✅ Architecture Agent completed")
-        agent_emitter.emit_agent_completed("architecture", output)
+        agent_emitter.emit_agent_completed("architecture", output, state.repo_url)
         return {"architecture_output": output}
     except Exception as e:
         print(f"❌ Architecture Agent failed: {str(e)}")
-        agent_emitter.emit_agent_error("architecture", str(e))
+        agent_emitter.emit_agent_error("architecture", str(e), state.repo_url)
         return {"architecture_output": {"error": str(e)}}
 
 
-def performance_node(state: State) -> dict:
+async def performance_node(state: State) -> dict:
     """
     Execute performance agent.
     """
     print("⚡ Running Performance Agent")
-    agent_emitter.emit_agent_started("performance")
+    agent_emitter.emit_agent_started("performance", state.repo_url)
     
     try:
-        data_dir = os.path.join(os.path.dirname(__file__), "data")
-        azure_metrics = _load_json_if_present(os.path.join(data_dir, "azure_metrics.json"))
-        azure_cost = _load_json_if_present(os.path.join(data_dir, "azure_cost.json"))
-        code_summary = state.get("code_summarizer_output", {}) or {}
+        code_summary = state.code_summarizer_output or {}
 
-        output = performance_agent(code_summary, azure_metrics, azure_cost)
+        output = await aperformance_agent(code_summary, _analysis_context(state))
         print("✅ Performance Agent completed")
-        agent_emitter.emit_agent_completed("performance", output)
+        agent_emitter.emit_agent_completed("performance", output, state.repo_url)
         return {"performance_output": output}
     except Exception as e:
         print(f"❌ Performance Agent failed: {str(e)}")
-        agent_emitter.emit_agent_error("performance", str(e))
+        agent_emitter.emit_agent_error("performance", str(e), state.repo_url)
         return {"performance_output": {"error": str(e)}}
 
 
-def finops_node(state: State) -> dict:
+async def finops_node(state: State) -> dict:
     """
     Execute finops agent.
     Analyzes cost optimization opportunities.
     """
     print("💰 Running FinOps Agent")
-    agent_emitter.emit_agent_started("finops")
+    agent_emitter.emit_agent_started("finops", state.repo_url)
     
     try:
-        data_dir = os.path.join(os.path.dirname(__file__), "data")
-        azure_metrics = _load_json_if_present(os.path.join(data_dir, "azure_metrics.json"))
-        azure_cost = _load_json_if_present(os.path.join(data_dir, "azure_cost.json"))
-
-        output = finops_agent(azure_metrics, azure_cost)
+        output = await afinops_agent(_analysis_context(state))
         print("✅ FinOps Agent completed")
-        agent_emitter.emit_agent_completed("finops", output)
+        agent_emitter.emit_agent_completed("finops", output, state.repo_url)
         return {"finops_output": output}
     except Exception as e:
         print(f"❌ FinOps Agent failed: {str(e)}")
-        agent_emitter.emit_agent_error("finops", str(e))
+        agent_emitter.emit_agent_error("finops", str(e), state.repo_url)
         return {"finops_output": {"error": str(e)}}
 
 
-def moderator_node(state: State) -> dict:
+async def combined_node(state: State) -> dict:
+    """
+    Execute the combined agent (fast mode).
+    One LLM call fills the architecture, performance, finops and moderator outputs;
+    events are emitted per agent so clients see the same agent lifecycle as in quality mode.
+    """
+    print("🧩 Running Combined Agent (architecture + performance + finops + moderator)")
+    for agent_name in COMBINED_AGENTS:
+        agent_emitter.emit_agent_started(agent_name, state.repo_url)
+    
+    try:
+        code_summary = state.code_summarizer_output or {}
+        outputs = await acombined_agent(code_summary, _analysis_context(state))
+        
+        print("✅ Combined Agent completed")
+        for agent_name in COMBINED_AGENTS:
+            output = outputs[f"{agent_name}_output"]
+            if "error" in output:
+                agent_emitter.emit_agent_error(agent_name, output["error"], state.repo_url)
+            else:
+                agent_emitter.emit_agent_completed(agent_name, output, state.repo_url)
+        return {
+            **outputs,
+            "final_analysis": _final_analysis(
+                state.code_summarizer_output, outputs["architecture_output"], outputs["performance_output"],
+                outputs["finops_output"], outputs["moderator_output"]
+            )
+        }
+    except Exception as e:
+        print(f"❌ Combined Agent failed: {str(e)}")
+        for agent_name in COMBINED_AGENTS:
+            agent_emitter.emit_agent_error(agent_name, str(e), state.repo_url)
+        return {
+            **{f"{agent_name}_output": {"error": str(e)} for agent_name in COMBINED_AGENTS},
+            "final_analysis": orjson.dumps({"status": "failed", "error": str(e)}).decode()
+        }
+
+
+def _final_analysis(code_summarizer_output, architecture_output, performance_output,
+                    finops_output, moderator_output) -> str:
+    """
+    Serialize the final analysis summary from a completed run's agent outputs.
+    """
+    return orjson.dumps({
+        "status": "completed",
+        "code_summarizer": code_summarizer_output,
+        "architecture": architecture_output,
+        "performance": performance_output,
+        "finops": finops_output,
+        "moderator_synthesis": moderator_output
+    }, option=orjson.OPT_INDENT_2).decode()
+
+
+async def moderator_node(state: State) -> dict:
     """
     Execute moderator agent.
     Takes outputs from architecture, performance, and finops agents.
     Synthesizes and prioritizes recommendations.
     """
     print("🎯 Running Moderator Agent")
-    agent_emitter.emit_agent_started("moderator")
+    agent_emitter.emit_agent_started("moderator", state.repo_url)
     
     try:
-        architecture_output = state.get('architecture_output', {})
-        performance_output = state.get('performance_output', {})
-        finops_output = state.get('finops_output', {})
+        architecture_output = state.architecture_output
+        performance_output = state.performance_output
+        finops_output = state.finops_output
         
-        output = moderator_agent(finops_output, architecture_output, performance_output)
-        
-        # Create final analysis summary
-        final_analysis = {
-            "status": "completed",
-            "code_summarizer": state.get('code_summarizer_output', {}),
-            "architecture": architecture_output,
-            "performance": performance_output,
-            "finops": finops_output,
-            "moderator_synthesis": output
-        }
+        output = await amoderator_agent(finops_output, architecture_output, performance_output)
         
         print("✅ Moderator Agent completed")
-        agent_emitter.emit_agent_completed("moderator", output)
+        agent_emitter.emit_agent_completed("moderator", output, state.repo_url)
         return {
             "moderator_output": output,
-            "final_analysis": json.dumps(final_analysis, indent=2)
+            "final_analysis": _final_analysis(
+                state.code_summarizer_output, architecture_output, performance_output, finops_output, output
+            )
         }
     except Exception as e:
         print(f"❌ Moderator Agent failed: {str(e)}")
-        agent_emitter.emit_agent_error("moderator", str(e))
+        agent_emitter.emit_agent_error("moderator", str(e), state.repo_url)
         return {
             "moderator_output": {"error": str(e)},
-            "final_analysis": json.dumps({"status": "failed", "error": str(e)})
+            "final_analysis": orjson.dumps({"status": "failed", "error": str(e)}).decode()
         }
 
 
-def build_graph():
+def _moderated(state: dict, output: dict) -> dict:
+    if "error" in output:
+        agent_emitter.emit_agent_error("moderator", output["error"], state.get('repo_url'))
+        final_analysis = orjson.dumps({"status": "failed", "error": output["error"]}).decode()
+    else:
+        agent_emitter.emit_agent_completed("moderator", output, state.get('repo_url'))
+        final_analysis = _final_analysis(
+            state.get('code_summarizer_output', {}), state.get('architecture_output', {}),
+            state.get('performance_output', {}), state.get('finops_output', {}), output
+        )
+    return {**state, "moderator_output": output, "final_analysis": final_analysis}
+
+
+async def moderate_batch(states: list) -> list:
+    """
+    Run the moderator over several completed analyses with batched LLM calls.
+    Used for multi-repository runs built with build_graph(include_moderator=False);
+    takes and returns the workflow's output dicts. A failed moderation only marks its own run.
     """
-    Build the LangChain StateGraph with the following execution flow:
+    print(f"🎯 Running Moderator Agent on {len(states)} analyses")
+    for state in states:
+        agent_emitter.emit_agent_started("moderator", state.get('repo_url'))
     
-    1. code_summarizer_node (runs first)
-    2. architecture_node (sequential - uses code_summarizer output)
-    3. performance_node & finops_node (run in parallel)
-    4. moderator_node (runs last - consumes all three outputs)
+    outputs = await amoderator_agent_batched([
+        (state.get('finops_output', {}), state.get('architecture_output', {}), state.get('performance_output', {}))
+        for state in states
+    ])
+    failed = sum(1 for output in outputs if "error" in output)
+    if failed:
+        print(f"❌ Moderator Agent failed for {failed} of {len(states)} analyses")
+    else:
+        print("✅ Moderator Agent completed")
+    return [_moderated(state, output) for state, output in zip(states, outputs)]
+
+
+def build_graph(mode: str = ANALYSIS_MODE, include_moderator: bool = True):
+    """
+    Build the LangChain StateGraph.
+    
+    mode="fast": code_summarizer_node -> combined_node (a single LLM call for all four roles).
+    
+    mode="quality" uses the following execution flow:
+    
+    1. code_summarizer_node & finops_node (start concurrently - finops only needs Azure data)
+    2. architecture_node & performance_node (run concurrently - both use code_summarizer output)
+    3. moderator_node (runs last - waits for architecture, performance and finops)
+    
+    With include_moderator=False the graph ends after step 2 so that several runs
+    can share batched moderator calls via moderate_batch.
     """
+    if mode not in ANALYSIS_MODES:
+        raise ValueError(f"mode must be one of {', '.join(ANALYSIS_MODES)}; got {mode!r}")
     graph = StateGraph(State)
     
+    if mode == "fast":
+        graph.add_node("code_summarizer", code_summarizer_node)
+        graph.add_node("combined", combined_node)
+        graph.add_edge(START, "code_summarizer")
+        graph.add_edge("code_summarizer", "combined")
+        graph.set_finish_point("combined")
+        return graph.compile()
+    
     # Add nodes
     graph.add_node("code_summarizer", code_summarizer_node)
     graph.add_node("architecture", architecture_node)
     graph.add_node("performance", performance_node)
     graph.add_node("finops", finops_node)
-    graph.add_node("moderator", moderator_node)
+    if include_moderator:
+        graph.add_node("moderator", moderator_node)
     
-    # Set entry point
-    graph.set_entry_point("code_summarizer")
+    # Entry points: finops is independent of the repo, so it overlaps the code/architecture chain
+    graph.add_edge(START, "code_summarizer")
+    graph.add_edge(START, "finops")
     
     # Define execution flow
-    # After code_summarizer, architecture must run (sequential dependency)
+    # After code_summarizer, architecture and performance run concurrently
     graph.add_edge("code_summarizer", "architecture")
+    graph.add_edge("code_summarizer", "performance")
     
-    # After architecture, performance and finops run in parallel
-    graph.add_edge("architecture", "performance")
-    graph.add_edge("architecture", "finops")
+    if not include_moderator:
+        graph.add_edge(["architecture", "performance", "finops"], END)
+        return graph.compile()
     
-    # Both performance and finops lead to moderator
-    graph.add_edge("performance", "moderator")
-    graph.add_edge("finops", "moderator")
+    # Moderator waits for every branch to finish
+    graph.add_edge(["architecture", "performance", "finops"], "moderator")
     
     # Moderator is the end
     graph.set_finish_point("moderator")
@@ -190,5 +311,8 @@ def build_graph():
     return graph.compile()
 
 
-# Compile the graph
+# Compile the graph (nodes are async; run with workflow.ainvoke)
 workflow = build_graph()
+
+# Quality flow without the moderator, for batched multi-repository runs
+analysis_workflow = build_graph(mode="quality", include_moderator=False)
@@ -1,16 +1,23 @@
 import json
+import os
+import sys
 import asyncio
+import logging
 from queue import Queue
-from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
 from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from graph import workflow
-from state import State
+from graph import workflow, analysis_workflow, moderate_batch, load_analysis_context, ANALYSIS_MODE
+from state import AnalysisContext
 from websocket_manager import manager
 from event_emitter import agent_emitter
 from metrics_extractor import get_metrics_extractor
 
+# Upper bound on repositories per /analyze/batch request, and on how many of them run at once
+MAX_BATCH_REPOS = int(os.getenv("MAX_BATCH_REPOS", "20"))
+MAX_BATCH_CONCURRENCY = int(os.getenv("MAX_BATCH_CONCURRENCY", "4"))
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Code Analysis Engine",
@@ -66,8 +73,43 @@ class AnalysisResponse(BaseModel):
         }
 
 
-# Thread pool for running blocking workflow operations
-executor = ThreadPoolExecutor(max_workers=4)
+class BatchAnalysisRequest(BaseModel):
+    """Request model for /analyze/batch endpoint"""
+    repo_urls: List[str]
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "repo_urls": [
+                    "https://github.com/your-username/service-a",
+                    "https://github.com/your-username/service-b"
+                ]
+            }
+        }
+
+
+class BatchAnalysisResponse(BaseModel):
+    """Response model for /analyze/batch endpoint"""
+    status: str
+    results: List[AnalysisResponse]
+
+
+def _initial_state(repo_url: str, analysis_context: Optional[AnalysisContext] = None) -> dict:
+    """
+    Build the workflow input for one repository (LangGraph coerces it into the State dataclass).
+    The Azure context is loaded and serialized here once instead of in every agent node.
+    """
+    return {
+        "repo_url": repo_url,
+        "analysis_context": analysis_context or load_analysis_context(),
+        "code_summarizer_output": None,
+        "architecture_output": None,
+        "performance_output": None,
+        "finops_output": None,
+        "moderator_output": None,
+        "final_analysis": None,
+        "negotiation_history": []
+    }
 
 
 async def process_workflow_events(event_queue: Queue):
@@ -83,15 +125,18 @@ async def process_workflow_events(event_queue: Queue):
             # Non-blocking check for events
             if not event_queue.empty():
                 event = event_queue.get_nowait()
-                
-                if event["type"] == "agent_started":
-                    await manager.send_agent_started(event["agent"])
-                elif event["type"] == "agent_completed":
-                    await manager.send_agent_completion(event["agent"], event["output"])
-                elif event["type"] == "agent_error":
-                    await manager.send_error(event["agent"], event["error"])
-                elif event["type"] == "analysis_completed":
-                    await manager.send_analysis_complete(event["result"])
+                try:
+                    if event["type"] == "agent_started":
+                        await manager.send_agent_started(event["agent"], event.get("repo_url"))
+                    elif event["type"] == "agent_completed":
+                        await manager.send_agent_completion(event["agent"], event["output"], event.get("repo_url"))
+                    elif event["type"] == "agent_error":
+                        await manager.send_error(event["agent"], event["error"], event.get("repo_url"))
+                    elif event["type"] == "analysis_completed":
+                        await manager.send_analysis_complete(event["result"])
+                finally:
+                    # Lets drain_workflow_events know this event has been handled
+                    event_queue.task_done()
             else:
                 # Small sleep to prevent busy waiting
                 await asyncio.sleep(0.1)
@@ -100,9 +145,34 @@ async def process_workflow_events(event_queue: Queue):
             await asyncio.sleep(0.1)
 
 
+async def drain_workflow_events(event_queue: Queue):
+    """
+    Wait until process_workflow_events has broadcast everything queued so far,
+    so the final analysis_completed events are sent before the event task is cancelled.
+    """
+    while event_queue.unfinished_tasks:
+        await asyncio.sleep(0.1)
+
+
+def _analysis_completed_event(repo_url: str, result: dict) -> dict:
+    return {
+        "type": "analysis_completed",
+        "result": {
+            "status": "success",
+            "repo_url": repo_url,
+            "code_summarizer": result.get('code_summarizer_output') or {},
+            "architecture": result.get('architecture_output') or {},
+            "performance": result.get('performance_output') or {},
+            "finops": result.get('finops_output') or {},
+            "moderator": result.get('moderator_output') or {}
+        }
+    }
+
+
 async def run_workflow_with_events(repo_url: str, event_queue: Queue):
     """
-    Run the workflow in a thread pool and emit events to the queue.
+    Run the workflow on the event loop and emit events to the queue.
+    Agent LLM calls are awaited, so event processing interleaves with them.
     
     Args:
         repo_url: Repository URL to analyze
@@ -111,55 +181,71 @@ async def run_workflow_with_events(repo_url: str, event_queue: Queue):
     Returns:
         The workflow result
     """
-    loop = asyncio.get_event_loop()
+    # Set up the event emitter with the queue
+    agent_emitter.set_event_queue(event_queue)
     
-    def workflow_execution():
-        # Set up the event emitter with the queue
-        agent_emitter.set_event_queue(event_queue)
-        
-        # Initialize state
-        initial_state: State = {
-            "repo_url": repo_url,
-            "code_summarizer_output": None,
-            "architecture_output": None,
-            "performance_output": None,
-            "finops_output": None,
-            "moderator_output": None,
-            "final_analysis": None
-        }
-        
-        print(f"\n{'='*60}")
-        print(f"🚀 Starting Analysis for: {repo_url}")
-        print(f"{'='*60}\n")
-        
-        # Execute workflow
-        result = workflow.invoke(initial_state)
-        
-        print(f"\n{'='*60}")
-        print(f"✅ Analysis Complete for: {repo_url}")
-        print(f"{'='*60}\n")
-        
-        # Queue final analysis complete event
-        event_queue.put({
-            "type": "analysis_completed",
-            "result": {
-                "status": "success",
-                "repo_url": repo_url,
-                "code_summarizer": result.get('code_summarizer_output') or {},
-                "architecture": result.get('architecture_output') or {},
-                "performance": result.get('performance_output') or {},
-                "finops": result.get('finops_output') or {},
-                "moderator": result.get('moderator_output') or {}
-            }
-        })
-        
-        return result
+    # Initialize state
+    initial_state = _initial_state(repo_url)
+    
+    print(f"\n{'='*60}")
+    print(f"🚀 Starting Analysis for: {repo_url}")
+    print(f"{'='*60}\n")
+    
+    # Execute workflow
+    result = await workflow.ainvoke(initial_state)
+    
+    print(f"\n{'='*60}")
+    print(f"✅ Analysis Complete for: {repo_url}")
+    print(f"{'='*60}\n")
+    
+    # Queue final analysis complete event
+    event_queue.put(_analysis_completed_event(repo_url, result))
     
-    # Run workflow in thread pool
-    result = await loop.run_in_executor(executor, workflow_execution)
     return result
 
 
+async def run_batch_workflow_with_events(repo_urls: List[str], event_queue: Queue):
+    """
+    Run the workflow for several repositories at once.
+    LangGraph's abatch interleaves every run on the event loop, so the agents' LLM calls
+    for all repositories are in flight together instead of one analysis after another.
+    At most MAX_BATCH_CONCURRENCY runs are in flight at once.
+    The moderator then synthesizes the analyses in batches, several repositories per LLM call.
+    Every agent event carries its repo_url, and one analysis_completed event is queued per repository.
+    
+    Args:
+        repo_urls: Repository URLs to analyze
+        event_queue: Queue to emit events to
+        
+    Returns:
+        List of workflow results, in the same order as repo_urls
+    """
+    agent_emitter.set_event_queue(event_queue)
+    
+    print(f"\n{'='*60}")
+    print(f"🚀 Starting Batch Analysis for {len(repo_urls)} repositories")
+    print(f"{'='*60}\n")
+    
+    analysis_context = load_analysis_context()
+    initial_states = [_initial_state(repo_url, analysis_context) for repo_url in repo_urls]
+    config = {"max_concurrency": MAX_BATCH_CONCURRENCY}
+    if ANALYSIS_MODE == "fast":
+        # The combined agent already produces the moderator output in its single call per repository
+        results = await workflow.abatch(initial_states, config=config)
+    else:
+        results = await analysis_workflow.abatch(initial_states, config=config)
+        results = await moderate_batch(results)
+    
+    print(f"\n{'='*60}")
+    print(f"✅ Batch Analysis Complete for {len(repo_urls)} repositories")
+    print(f"{'='*60}\n")
+    
+    for repo_url, result in zip(repo_urls, results):
+        event_queue.put(_analysis_completed_event(repo_url, result))
+    
+    return results
+
+
 @app.get("/health", tags=["Health"])
 async def health_check():
     """Health check endpoint"""
@@ -238,10 +324,12 @@ async def analyze_repository(request: AnalysisRequest):
     Flow:
     1. Code Summarizer: Extracts and summarizes code structure
     2. Architecture Agent: Analyzes architecture (uses code summarizer output)
-    3. Performance Agent: Identifies performance bottlenecks (parallel)
-    4. FinOps Agent: Analyzes cost optimization (parallel)
+    3. Performance Agent: Identifies performance bottlenecks (parallel with architecture)
+    4. FinOps Agent: Analyzes cost optimization (parallel with steps 1-3)
     5. Moderator Agent: Synthesizes all outputs into actionable recommendations
     
+    With ANALYSIS_MODE=fast (default), steps 2-5 are a single combined LLM call.
+    
     Note: Real-time agent completion updates are sent via WebSocket at /ws
     
     Args:
@@ -267,11 +355,14 @@ async def analyze_repository(request: AnalysisRequest):
         workflow_task = asyncio.create_task(run_workflow_with_events(repo_url, event_queue))
         event_task = asyncio.create_task(process_workflow_events(event_queue))
         
-        # Wait for workflow to complete
-        result = await workflow_task
-        
-        # Cancel event processing once workflow is done
-        event_task.cancel()
+        try:
+            # Wait for workflow to complete
+            result = await workflow_task
+            # Let the final events go out before event processing stops
+            await drain_workflow_events(event_queue)
+        finally:
+            # Cancel event processing once workflow is done, also when it failed
+            event_task.cancel()
         
         # Extract individual agent responses
         code_summarizer = result.get('code_summarizer_output') or {}
@@ -316,6 +407,79 @@ async def analyze_repository(request: AnalysisRequest):
         )
 
 
+@app.post("/analyze/batch", response_model=BatchAnalysisResponse, tags=["Analysis"])
+async def analyze_repositories(request: BatchAnalysisRequest):
+    """
+    Analyze several GitHub repositories concurrently with the multi-agent workflow.
+    
+    Each repository runs the same flow as /analyze; agent updates for all of them
+    are sent via WebSocket at /ws, tagged with their repo_url.
+    At most MAX_BATCH_REPOS repositories are accepted per request.
+    
+    Args:
+        request: BatchAnalysisRequest with repo_urls
+        
+    Returns:
+        BatchAnalysisResponse with one AnalysisResponse per repository
+    """
+    repo_urls = [url.strip() for url in request.repo_urls if url and url.strip()]
+    if not repo_urls:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid repo_urls. Must contain at least one non-empty string."
+        )
+    if len(repo_urls) > MAX_BATCH_REPOS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many repo_urls. At most {MAX_BATCH_REPOS} repositories per batch."
+        )
+    
+    try:
+        # Create an event queue for this batch
+        event_queue: Queue = Queue()
+        
+        # Run workflows and process events concurrently
+        workflow_task = asyncio.create_task(run_batch_workflow_with_events(repo_urls, event_queue))
+        event_task = asyncio.create_task(process_workflow_events(event_queue))
+        
+        try:
+            results = await workflow_task
+            await drain_workflow_events(event_queue)
+        finally:
+            event_task.cancel()
+        
+        try:
+            metrics_extractor = get_metrics_extractor()
+            metrics_data = metrics_extractor.get_all_metrics()
+        except Exception as e:
+            print(f"⚠️ Error fetching metrics: {str(e)}")
+            metrics_data = {}
+        
+        return BatchAnalysisResponse(
+            status="success",
+            results=[
+                AnalysisResponse(
+                    status="success",
+                    repo_url=repo_url,
+                    code_summarizer=result.get('code_summarizer_output') or {},
+                    architecture=result.get('architecture_output') or {},
+                    performance=result.get('performance_output') or {},
+                    finops=result.get('finops_output') or {},
+                    moderator=result.get('moderator_output') or {},
+                    metrics=metrics_data
+                )
+                for repo_url, result in zip(repo_urls, results)
+            ]
+        )
+        
+    except Exception as e:
+        print(f"❌ Batch workflow execution error: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Batch workflow execution failed: {str(e)}"
+        )
+
+
 @app.get("/", tags=["Info"])
 async def root():
     """Root endpoint with API information"""
@@ -325,6 +489,7 @@ async def root():
         "endpoints": {
             "health": "GET /health",
             "analyze": "POST /analyze",
+            "analyze_batch": "POST /analyze/batch",
             "websocket": "WS /ws",
             "docs": "GET /docs",
             "openapi": "GET /openapi.json"
@@ -342,17 +507,23 @@ async def root():
                     "type": "agent_completed",
                     "agent": "code_summarizer",
                     "status": "completed",
-                    "output": { }
+                    "output": { },
+                    "repo_url": "https://github.com/..."
                 }
             }
         },
         "workflow": {
             "description": "Multi-agent code analysis workflow",
+            "mode": ANALYSIS_MODE,
+            "fast_flow": [
+                "Code Summarizer (Sequential)",
+                "Combined Agent (Architecture + Performance + FinOps + Moderator in one LLM call)"
+            ],
             "flow": [
                 "Code Summarizer (Sequential)",
-                "Architecture Agent (Sequential - uses code summarizer output)",
-                "Performance Agent (Parallel)",
-                "FinOps Agent (Parallel)",
+                "Architecture Agent (Parallel - uses code summarizer output)",
+                "Performance Agent (Parallel - uses code summarizer output)",
+                "FinOps Agent (Parallel - runs alongside the code analysis chain)",
                 "Moderator Agent (Final synthesis)"
             ]
         }
@@ -361,6 +532,12 @@ async def root():
 
 if __name__ == "__main__":
     import uvicorn
+    from agents._llm import GROQ_API_KEY
+    # Fail at startup rather than on every agent call
+    if not GROQ_API_KEY:
+        sys.exit("GROQ_API_KEY missing")
+    # LOG_LEVEL=DEBUG surfaces raw LLM responses from the agents
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
     uvicorn.run(
         app,
         host="0.0.0.0",
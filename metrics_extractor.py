@@ -4,7 +4,7 @@ Loads metrics from JSON files and provides structured data for frontend consumpt
 """
 
 import json
-import os
+from pathlib import Path
 from typing import Dict, Optional
 
 
@@ -19,8 +19,8 @@ class MetricsExtractor:
             data_dir: Directory containing azure_metrics.json and azure_cost.json
         """
         self.data_dir = data_dir
-        self.metrics_file = os.path.join(data_dir, "azure_metrics.json")
-        self.cost_file = os.path.join(data_dir, "azure_cost.json")
+        self.metrics_file = Path(data_dir) / "azure_metrics.json"
+        self.cost_file = Path(data_dir) / "azure_cost.json"
     
     def load_metrics(self) -> Dict:
         """
@@ -30,9 +30,8 @@ class MetricsExtractor:
             Dictionary containing Azure metrics or empty dict if file not found
         """
         try:
-            if os.path.exists(self.metrics_file):
-                with open(self.metrics_file, 'r') as f:
-                    return json.load(f)
+            if self.metrics_file.is_file():
+                return json.loads(self.metrics_file.read_text(encoding="utf-8", errors="replace"))
         except Exception as e:
             print(f"⚠️ Error loading metrics file: {str(e)}")
         
@@ -46,9 +45,8 @@ class MetricsExtractor:
             Dictionary containing Azure costs or empty dict if file not found
         """
         try:
-            if os.path.exists(self.cost_file):
-                with open(self.cost_file, 'r') as f:
-                    return json.load(f)
+            if self.cost_file.is_file():
+                return json.loads(self.cost_file.read_text(encoding="utf-8", errors="replace"))
         except Exception as e:
             print(f"⚠️ Error loading cost file: {str(e)}")
         
@@ -1,5 +1,5 @@
-from typing import TypedDict, Optional, Annotated
-from typing_extensions import NotRequired
+from dataclasses import dataclass, field
+from typing import TypedDict, Optional, Annotated, List
 from langgraph.graph import add_messages
 
 
@@ -10,23 +10,54 @@ def merge_output(left, right):
     return left
 
 
-class State(TypedDict):
+def append_history(left, right):
+    """Append-only reducer: nodes return just their new messages, not the whole history"""
+    if not right:
+        return left or []
+    if not left:
+        return list(right)
+    return left + right
+
+
+class AnalysisContext(TypedDict):
+    """
+    Azure inputs shared by every agent in a run, loaded and serialized once.
+    
+    Attributes:
+        azure_metrics: Parsed azure_metrics.json
+        azure_cost: Parsed azure_cost.json
+        azure_metrics_json: azure_metrics serialized for prompts
+        azure_cost_json: azure_cost serialized for prompts
+    """
+    azure_metrics: dict
+    azure_cost: dict
+    azure_metrics_json: str
+    azure_cost_json: str
+
+
+@dataclass(slots=True)
+class State:
     """
     State schema for the LangChain workflow.
+    Slotted dataclass: nodes read fields as attributes and return dicts of the fields they update.
     
     Attributes:
         repo_url: GitHub repository URL to analyze
+        analysis_context: Azure metrics/cost shared by the agents (see AnalysisContext)
         code_summarizer_output: Output from code summarizer agent
         architecture_output: Output from architecture agent
         performance_output: Output from performance agent (concurrent update)
         finops_output: Output from finops agent (concurrent update)
         moderator_output: Final synthesized output from moderator agent
         final_analysis: Formatted final analysis result
+        negotiation_history: Messages exchanged between agents (append-only)
     """
     repo_url: str
-    code_summarizer_output: NotRequired[Optional[dict]]
-    architecture_output: NotRequired[Optional[dict]]
-    performance_output: Annotated[Optional[dict], merge_output]
-    finops_output: Annotated[Optional[dict], merge_output]
-    moderator_output: NotRequired[Optional[dict]]
-    final_analysis: NotRequired[Optional[str]]
+    analysis_context: Optional[AnalysisContext] = None
+    code_summarizer_output: Optional[dict] = None
+    architecture_output: Optional[dict] = None
+    performance_output: Annotated[Optional[dict], merge_output] = None
+    finops_output: Annotated[Optional[dict], merge_output] = None
+    moderator_output: Optional[dict] = None
+    final_analysis: Optional[str] = None
+    negotiation_history: Annotated[List[str], append_history] = field(default_factory=list)
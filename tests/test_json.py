@@ -0,0 +1,104 @@
+import orjson
+import pytest
+
+from agents._json import JsonStreamScanner, first_json_array, first_json_object, outermost_json_object
+
+
+def test_object_ignores_braces_inside_strings():
+    text = '{"pattern": "}{", "nested": {"template": "${name}"}}'
+    assert first_json_object(text) == text
+
+
+def test_array_ignores_brackets_inside_strings():
+    text = '[{"issue_detected": "list[0] is ]unbounded["}]'
+    assert first_json_array(text) == text
+
+
+def test_escaped_quote_does_not_end_string():
+    text = r'{"recommendation": "set \"}\" in config", "ok": true}'
+    assert first_json_object(text) == text
+    assert orjson.loads(first_json_object(text))["ok"] is True
+
+
+def test_escaped_backslash_before_closing_quote():
+    text = r'{"path": "C:\\"} and a stray }'
+    assert first_json_object(text) == r'{"path": "C:\\"}'
+
+
+def test_prose_before_and_after_json():
+    text = 'Sure! Here are the proposals:\n[{"a": 1}, {"b": [2, 3]}]\nLet me know [if] you need more.'
+    assert first_json_array(text) == '[{"a": 1}, {"b": [2, 3]}]'
+
+    text = 'The evaluation:\n{"a": {"b": "}"}}\nThat covers it. {extra}'
+    assert first_json_object(text) == '{"a": {"b": "}"}}'
+
+
+def test_markdown_fence_with_trailing_bracket():
+    text = '```json\n[1, 2]\n```\nSee [docs].'
+    assert first_json_array(text) == "[1, 2]"
+
+
+@pytest.mark.parametrize("text", ['[{"a": 1}', '[{"a": "unterminated]', '{"a": {"b": 1}', ""])
+def test_truncated_input_returns_none(text):
+    finder = first_json_array if text.startswith("[") else first_json_object
+    assert finder(text) is None
+
+
+def test_no_json_returns_none():
+    assert first_json_array("nothing to see here") is None
+    assert first_json_object("nothing to see here") is None
+
+
+def test_outermost_object_spans_first_to_last_brace():
+    assert outermost_json_object('Result: {"a": {"b": 1}} thanks') == b'{"a": {"b": 1}}'
+    assert outermost_json_object("no braces") == b"no braces"
+
+
+STREAM_CASES = [
+    'Here you go: [{"issue_detected": "a ] in \\"quotes\\"", "savings": "10%"}] trailing ] prose',
+    r'[{"path": "C:\\"}, {"text": "\\\"[\\\""}] done',
+    '["\\u005d", {"k": "[[["}]',
+]
+
+
+@pytest.mark.parametrize("text", STREAM_CASES)
+def test_stream_scanner_matches_batch_scan_for_every_split(text):
+    expected = first_json_array(text)
+    assert expected is not None
+    for split in range(len(text) + 1):
+        scanner = JsonStreamScanner()
+        scanner.feed(text[:split])
+        scanner.feed(text[split:])
+        assert scanner.value == expected
+
+
+@pytest.mark.parametrize("text", STREAM_CASES)
+def test_stream_scanner_one_character_chunks(text):
+    scanner = JsonStreamScanner()
+    results = [scanner.feed(char) for char in text]
+    assert scanner.value == first_json_array(text)
+    # The value is reported as soon as its closing bracket arrives
+    first_hit = next(i for i, result in enumerate(results) if result is not None)
+    assert text[first_hit] == "]"
+    assert first_hit == text.index(scanner.value) + len(scanner.value) - 1
+
+
+def test_stream_scanner_object_mode():
+    scanner = JsonStreamScanner("{", "}")
+    assert scanner.feed('Sure: {"a": "}", ') is None
+    assert scanner.feed('"b": {"c": 1}} and }') == '{"a": "}", "b": {"c": 1}}'
+
+
+def test_stream_scanner_truncated_stream_never_completes():
+    scanner = JsonStreamScanner()
+    for chunk in ('[{"a": ', '"b\\"]"', "}"):
+        assert scanner.feed(chunk) is None
+    assert scanner.value is None
+    assert scanner.text == '[{"a": "b\\"]"}'
+
+
+def test_stream_scanner_ignores_feeds_after_completion():
+    scanner = JsonStreamScanner()
+    assert scanner.feed("[1]") == "[1]"
+    assert scanner.feed("[2]") == "[1]"
+    assert scanner.text == "[1]"
@@ -5,7 +5,7 @@ Manages multiple concurrent WebSocket connections and broadcasts agent completio
 
 import json
 import asyncio
-from typing import Set, Dict
+from typing import Set, Dict, Optional
 from fastapi import WebSocket
 
 
@@ -59,13 +59,14 @@ class ConnectionManager:
         # Remove disconnected clients
         self.active_connections -= disconnected
     
-    async def send_agent_completion(self, agent_name: str, output: Dict):
+    async def send_agent_completion(self, agent_name: str, output: Dict, repo_url: Optional[str] = None):
         """
         Send an agent completion message.
         
         Args:
             agent_name: Name of the agent that completed
             output: The output from the agent
+            repo_url: Repository the agent is analyzing, if known
         """
         message = {
             "type": "agent_completed",
@@ -73,29 +74,35 @@ class ConnectionManager:
             "status": "completed",
             "output": output
         }
+        if repo_url:
+            message["repo_url"] = repo_url
         await self.broadcast(message)
     
-    async def send_agent_started(self, agent_name: str):
+    async def send_agent_started(self, agent_name: str, repo_url: Optional[str] = None):
         """
         Send an agent started message.
         
         Args:
             agent_name: Name of the agent that started
+            repo_url: Repository the agent is analyzing, if known
         """
         message = {
             "type": "agent_started",
             "agent": agent_name,
             "status": "in_progress"
         }
+        if repo_url:
+            message["repo_url"] = repo_url
         await self.broadcast(message)
     
-    async def send_error(self, agent_name: str, error: str):
+    async def send_error(self, agent_name: str, error: str, repo_url: Optional[str] = None):
         """
         Send an error message.
         
         Args:
             agent_name: Name of the agent that encountered an error
             error: Error message
+            repo_url: Repository the agent is analyzing, if known
         """
         message = {
             "type": "agent_error",
@@ -103,6 +110,8 @@ class ConnectionManager:
             "status": "error",
             "error": error
         }
+        if repo_url:
+            message["repo_url"] = repo_url
         await self.broadcast(message)
     
     async def send_analysis_complete(self, result: Dict):